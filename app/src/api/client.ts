@@ -1,5 +1,9 @@
 const API_URL = import.meta.env.VITE_API_URL;
 
+// Echoed back so reads stay on the primary right after a write, whichever
+// worker serves them (backend/replicas.py).
+let lastWrite: string | null = null;
+
 type FetchOptions = RequestInit & {
   onUnauthorized?: () => void;
 };
@@ -12,12 +16,14 @@ export async function apiFetch<T>(
   const headers: HeadersInit = {
     "Content-Type": "application/json",
     ...(token && { Authorization: `Bearer ${token}` }),
+    ...(lastWrite && { "X-Last-Write": lastWrite }),
   };
 
   const res = await fetch(`${API_URL}${url}`, {
     ...options,
     headers,
   });
+  lastWrite = res.headers.get("X-Last-Write") ?? lastWrite;
 
   if (res.status === 401) {
     if (options.onUnauthorized) {
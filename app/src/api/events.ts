@@ -0,0 +1,40 @@
+// src/api/events.ts
+import { apiFetch } from "./client";
+import { getGlobalOnUnauthorized } from "./authHandler";
+import type { Media } from "./media";
+import type { Task } from "./tasks";
+
+const API_URL = import.meta.env.VITE_API_URL;
+
+export type ChangeEvent = {
+  entity: "media" | "task";
+  id: number;
+  op: "create" | "update" | "delete";
+  version: number;
+};
+
+export type SyncResult = {
+  cursor: number;
+  has_more: boolean;
+  media: Media[];
+  tasks: Task[];
+  deleted: { media: number[]; tasks: number[] };
+};
+
+export async function getChanges(since: number, token: string): Promise<SyncResult> {
+  return apiFetch<SyncResult>(`/sync?since=${since}`, { onUnauthorized: getGlobalOnUnauthorized() }, token);
+}
+
+// Listens on /events. The browser reconnects by itself (sending Last-Event-ID),
+// and the server answers with "resync" when changes were missed meanwhile,
+// including after it dropped us for falling behind.
+export function subscribeToChanges(
+  token: string,
+  onChange: (change: ChangeEvent) => void,
+  onResync: () => void
+): () => void {
+  const source = new EventSource(`${API_URL}/events?access_token=${encodeURIComponent(token)}`);
+  source.addEventListener("change", (e) => onChange(JSON.parse((e as MessageEvent).data)));
+  source.addEventListener("resync", () => onResync());
+  return () => source.close();
+}
@@ -17,13 +17,39 @@ export type Media = {
   tags: Tag[];
   last_edited: string;
   user_id: number;
+  change_seq?: number;
 };
 
-export type MediaBase = Omit<Media, "id" | "last_edited" | "user_id">;
+export type MediaBase = Omit<Media, "id" | "last_edited" | "user_id" | "change_seq">;
 
 
-export async function getMedia(token: string): Promise<Media[]> {
-  return apiFetch<Media[]>("/media/", { onUnauthorized: getGlobalOnUnauthorized() }, token);
+export type MediaQuery = {
+  category?: Media["category"];
+  status?: Media["status"];
+  name?: string;
+  tag?: string[];
+  sort?: "name" | "last_edited" | "progress" | "rank";
+  order?: "asc" | "desc";
+  limit?: number;
+  cursor?: string;
+};
+
+function toSearchParams(query: MediaQuery): string {
+  const params = new URLSearchParams();
+  Object.entries(query).forEach(([key, value]) => {
+    if (value === undefined || value === "") return;
+    if (Array.isArray(value)) {
+      value.forEach((v) => params.append(key, v));
+    } else {
+      params.append(key, String(value));
+    }
+  });
+  const qs = params.toString();
+  return qs ? `?${qs}` : "";
+}
+
+export async function getMedia(token: string, query: MediaQuery = {}): Promise<Media[]> {
+  return apiFetch<Media[]>(`/media/${toSearchParams(query)}`, { onUnauthorized: getGlobalOnUnauthorized() }, token);
 }
 
 export async function addMedia(media: MediaBase, token: string): Promise<Media> {
@@ -59,4 +85,35 @@ export async function updateMedia(
     },
     token
   );
-}
\ No newline at end of file
+}
+
+// Partial update: only the given fields (and changed tag links) are written.
+export async function patchMedia(
+  id: number,
+  data: Partial<MediaBase>,
+  token: string
+): Promise<Media> {
+  return apiFetch<Media>(
+    `/media/${id}`,
+    {
+      method: "PATCH",
+      body: JSON.stringify(data),
+      onUnauthorized: getGlobalOnUnauthorized(),
+    },
+    token
+  );
+}
+
+export type TagUsage = {
+  name: string;
+  count: number;
+};
+
+export async function getTagSuggestions(prefix: string, token: string, limit = 10): Promise<TagUsage[]> {
+  const params = new URLSearchParams({ prefix, limit: String(limit) });
+  return apiFetch<TagUsage[]>(`/tags/?${params}`, { onUnauthorized: getGlobalOnUnauthorized() }, token);
+}
+
+export async function getTagFacets(token: string): Promise<TagUsage[]> {
+  return apiFetch<TagUsage[]>("/tags/facets", { onUnauthorized: getGlobalOnUnauthorized() }, token);
+}
@@ -8,8 +8,13 @@ export type Task = {
   description?: string;
   created_at: string;
   user_id: number;
+  priority_score?: number;
+  ranked?: boolean;
+  rank?: string;
 };
 
+export type RankingPair = { task: Task; other: Task };
+
 
 export async function validateToken(token: string): Promise<boolean> {
   try {
@@ -55,3 +60,36 @@ export async function updateTask(
     token
   );
 }
+
+export async function getNextRankingPair(token: string): Promise<RankingPair | null> {
+  return apiFetch<RankingPair | null>(
+    "/tasks/ranking/next",
+    { method: "POST", onUnauthorized: getGlobalOnUnauthorized() },
+    token
+  );
+}
+
+export async function compareTasks(winnerId: number, loserId: number, token: string): Promise<Task> {
+  return apiFetch<Task>(
+    "/tasks/ranking/compare",
+    {
+      method: "POST",
+      body: JSON.stringify({ winner_id: winnerId, loser_id: loserId }),
+      onUnauthorized: getGlobalOnUnauthorized(),
+    },
+    token
+  );
+}
+
+// Persist a drag-and-drop move: place the task right after `afterId` (null = top).
+export async function moveTask(id: number, afterId: number | null, token: string): Promise<Task> {
+  return apiFetch<Task>(
+    `/tasks/${id}/move`,
+    {
+      method: "PATCH",
+      body: JSON.stringify({ after_id: afterId }),
+      onUnauthorized: getGlobalOnUnauthorized(),
+    },
+    token
+  );
+}
@@ -5,6 +5,7 @@ import { getTasks, addTask, deleteTask, updateTask } from '../api/tasks';
 import type{ Task } from '../api/tasks';
 import { TaskItem } from './TaskItem';
 import { useMergeSort } from "../hooks/useMergeSort";
+import { applyChanges, useChangeFeed } from "../hooks/useChangeFeed";
 import { SortUI } from "./SortUI";
 import { SortedTaskList } from './sortedList';
 
@@ -24,6 +25,13 @@ export function Tasks({ token }: TasksProps) {
     getTasks(token).then(setTasks).catch(console.error);
   }, [token]);
 
+  useChangeFeed(
+    token,
+    "task",
+    (changes) => setTasks((prev) => applyChanges(prev, changes.tasks, changes.deleted.tasks)),
+    () => getTasks(token).then(setTasks).catch(console.error)
+  );
+
   const handleAdd = async () => {
     if (!newTitle) return;
     const newTask = await addTask(newTitle, token);
@@ -86,7 +94,7 @@ export function Tasks({ token }: TasksProps) {
         <SortUI taskA={currentComparison[0]} taskB={currentComparison[1]}  onChoose={(task) => choose(task.id === currentComparison[0].id ? tasks.indexOf(currentComparison[0]) : tasks.indexOf(currentComparison[1]))} />
       )}
 
-      {!isSorting && sortedTasks && <SortedTaskList tasks={sortedTasks} />}
+      {!isSorting && sortedTasks && <SortedTaskList tasks={sortedTasks} token={token} />}
     </div>
   );
 }
\ No newline at end of file
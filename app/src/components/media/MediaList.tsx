@@ -1,6 +1,6 @@
 import { useState } from "react";
 import type { Media, MediaBase } from "@api/media";
-import { updateMedia, deleteMedia } from "@api/media";
+import { patchMedia, deleteMedia } from "@api/media";
 import { CustomNumberInput } from "../numberInput";
 import { MediaEditForm } from "./MediaEditForm";
 
@@ -46,22 +46,9 @@ export function MediaList({
     value: string | number
   ) => {
     try {
-      const existing = mediaList.find((m) => m.id === id);
-      if (!existing) return;
-
-      const updated: MediaBase = {
-        name: existing.name,
-        category: existing.category,
-        status: existing.status,
-        progress: existing.progress,
-        rating: existing.rating,
-        tags: existing.tags,
-        [field]: value,
-      };
-
-      await updateMedia(id, updated, token);
+      const updated = await patchMedia(id, { [field]: value }, token);
       setMediaList((prev) =>
-        prev.map((m) => (m.id === id ? { ...m, ...updated } : m))
+        prev.map((m) => (m.id === id ? updated : m))
       );
     } catch (error) {
       console.error("Failed to update:", error);
@@ -4,6 +4,7 @@ import { getMedia, addMedia } from "@api/media.ts";
 import { AddMediaForm } from "./AddMediaForm";
 import { MediaFilters } from "./MediaFilters";
 import { MediaList } from "./MediaList";
+import { applyChanges, useChangeFeed } from "../../hooks/useChangeFeed";
 
 interface MediaManagerProps {
   token: string;
@@ -34,6 +35,13 @@ export function MediaManager({ token }: MediaManagerProps) {
     fetchMedia();
   }, []);
 
+  useChangeFeed(
+    token,
+    "media",
+    (changes) => setMediaList((prev) => applyChanges(prev, changes.media, changes.deleted.media)),
+    () => fetchMedia()
+  );
+
   const fetchMedia = async () => {
     try {
       const data = await getMedia(token);
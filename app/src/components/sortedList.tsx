@@ -14,13 +14,15 @@ import {
 } from '@dnd-kit/sortable';
 import { CSS } from '@dnd-kit/utilities';
 import { useState } from 'react';
+import { moveTask } from '../api/tasks';
 import type{ Task } from '../api/tasks';
 
 interface Props {
   tasks: Task[];
+  token: string;
 }
 
-export function SortedTaskList({ tasks }: Props) {
+export function SortedTaskList({ tasks, token }: Props) {
   const [sortedTasks, setSortedTasks] = useState<Task[]>(tasks);
 
   const handleDragEnd = (event: DragEndEvent) => {
@@ -29,7 +31,10 @@ export function SortedTaskList({ tasks }: Props) {
     if (active.id !== over?.id) {
       const oldIndex = sortedTasks.findIndex((t) => t.id === active.id);
       const newIndex = sortedTasks.findIndex((t) => t.id === over?.id);
-      setSortedTasks(arrayMove(sortedTasks, oldIndex, newIndex));
+      const moved = arrayMove(sortedTasks, oldIndex, newIndex);
+      setSortedTasks(moved);
+      // one row is rewritten server-side, whatever the list length
+      moveTask(moved[newIndex].id, newIndex > 0 ? moved[newIndex - 1].id : null, token).catch(console.error);
     }
   };
 
@@ -0,0 +1,65 @@
+import { useEffect, useRef } from "react";
+import { getChanges, subscribeToChanges } from "../api/events";
+import type { ChangeEvent, SyncResult } from "../api/events";
+
+// Merge upserted rows into a list by id and drop deleted ones.
+export function applyChanges<T extends { id: number }>(items: T[], upserted: T[], deleted: number[]): T[] {
+  const byId = new Map(upserted.map((item) => [item.id, item]));
+  const gone = new Set(deleted);
+  const merged = items.filter((item) => !gone.has(item.id)).map((item) => byId.get(item.id) ?? item);
+  const known = new Set(items.map((item) => item.id));
+  return [...merged, ...upserted.filter((item) => !known.has(item.id) && !gone.has(item.id))];
+}
+
+// Calls onChanges with the /sync delta whenever another tab or device changes
+// `entity`; onResync (a full reload) when the stream reports missed changes.
+export function useChangeFeed(
+  token: string,
+  entity: ChangeEvent["entity"],
+  onChanges: (changes: SyncResult) => void,
+  onResync: () => void
+) {
+  const handlers = useRef({ onChanges, onResync });
+  handlers.current = { onChanges, onResync };
+
+  useEffect(() => {
+    let cursor: number | null = null;
+    let timer: ReturnType<typeof setTimeout> | null = null;
+
+    const pull = async (since: number) => {
+      try {
+        let next = since;
+        let changes: SyncResult;
+        do {
+          changes = await getChanges(next, token);
+          next = cursor = changes.cursor;
+          handlers.current.onChanges(changes);
+        } while (changes.has_more);
+      } catch (err) {
+        console.error("Failed to sync changes:", err);
+        handlers.current.onResync();
+      }
+    };
+
+    const onChange = (change: ChangeEvent) => {
+      if (change.entity !== entity) return;
+      // one write can send several events; fetch them with a single /sync
+      const since = cursor ?? change.version - 1;
+      if (timer === null) {
+        timer = setTimeout(() => {
+          timer = null;
+          pull(since);
+        }, 50);
+      }
+    };
+
+    const unsubscribe = subscribeToChanges(token, onChange, () => {
+      cursor = null;
+      handlers.current.onResync();
+    });
+    return () => {
+      if (timer !== null) clearTimeout(timer);
+      unsubscribe();
+    };
+  }, [token, entity]);
+}
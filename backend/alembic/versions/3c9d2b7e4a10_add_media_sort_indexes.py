@@ -0,0 +1,32 @@
+"""add composite media sort indexes
+
+Revision ID: 3c9d2b7e4a10
+Revises: 1fe8807ad2f7
+Create Date: 2026-10-18 10:02:11.412093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9d2b7e4a10'
+down_revision: Union[str, Sequence[str], None] = '1fe8807ad2f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_media_user_id_name_id', 'media', ['user_id', 'name', 'id'], unique=False)
+    op.create_index('ix_media_user_id_last_edited_id', 'media', ['user_id', 'last_edited', 'id'], unique=False)
+    op.create_index('ix_media_user_id_progress_id', 'media', ['user_id', 'progress', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_media_user_id_progress_id', table_name='media')
+    op.drop_index('ix_media_user_id_last_edited_id', table_name='media')
+    op.drop_index('ix_media_user_id_name_id', table_name='media')
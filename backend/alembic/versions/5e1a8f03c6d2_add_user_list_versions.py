@@ -0,0 +1,34 @@
+"""add per-user list version counters
+
+Revision ID: 5e1a8f03c6d2
+Revises: 3c9d2b7e4a10
+Create Date: 2026-10-18 14:21:37.118502
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1a8f03c6d2'
+down_revision: Union[str, Sequence[str], None] = '3c9d2b7e4a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user', sa.Column('media_version', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('user', sa.Column('media_modified', sa.DateTime(), nullable=True))
+    op.add_column('user', sa.Column('task_version', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('user', sa.Column('task_modified', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('user', 'task_modified')
+    op.drop_column('user', 'task_version')
+    op.drop_column('user', 'media_modified')
+    op.drop_column('user', 'media_version')
@@ -0,0 +1,79 @@
+"""add change tracking for delta sync
+
+Revision ID: 8b4f2d6e9a31
+Revises: 5e1a8f03c6d2
+Create Date: 2026-10-18 15:48:02.530716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b4f2d6e9a31'
+down_revision: Union[str, Sequence[str], None] = '5e1a8f03c6d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user', sa.Column('change_seq', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('media', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('media', sa.Column('change_seq', sa.Integer(), nullable=False, server_default='0'))
+    op.create_index('ix_media_user_id_change_seq', 'media', ['user_id', 'change_seq'], unique=False)
+    op.add_column('task', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('task', sa.Column('change_seq', sa.Integer(), nullable=False, server_default='0'))
+    op.create_index('ix_task_user_id_change_seq', 'task', ['user_id', 'change_seq'], unique=False)
+    op.create_table('tombstone',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('entity', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('change_seq', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tombstone_user_id_change_seq', 'tombstone', ['user_id', 'change_seq'], unique=False)
+    _backfill()
+
+
+def _backfill() -> None:
+    # give existing rows cursors 1..n per user (media first, then tasks) so
+    # /sync?since=0 returns them; at 0 they would never match change_seq > since
+    op.execute("""
+        UPDATE media SET change_seq = numbered.seq
+        FROM (SELECT id, row_number() OVER (PARTITION BY user_id ORDER BY id) AS seq FROM media) AS numbered
+        WHERE media.id = numbered.id
+    """)
+    op.execute("""
+        UPDATE task SET change_seq = numbered.seq
+        FROM (
+            SELECT task.id, row_number() OVER (PARTITION BY task.user_id ORDER BY task.id)
+                + (SELECT count(*) FROM media WHERE media.user_id = task.user_id) AS seq
+            FROM task
+        ) AS numbered
+        WHERE task.id = numbered.id
+    """)
+    op.execute("""
+        UPDATE "user" SET change_seq =
+            (SELECT count(*) FROM media WHERE media.user_id = "user".id)
+            + (SELECT count(*) FROM task WHERE task.user_id = "user".id)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tombstone_user_id_change_seq', table_name='tombstone')
+    op.drop_table('tombstone')
+    op.drop_index('ix_task_user_id_change_seq', table_name='task')
+    op.drop_column('task', 'change_seq')
+    op.drop_column('task', 'updated_at')
+    op.drop_index('ix_media_user_id_change_seq', table_name='media')
+    op.drop_column('media', 'change_seq')
+    op.drop_column('media', 'updated_at')
+    op.drop_column('user', 'change_seq')
@@ -0,0 +1,76 @@
+"""add append-only media progress history with daily/weekly rollups
+
+Revision ID: 9d3f6b2a7c41
+Revises: f1a6c3d8b925
+Create Date: 2026-10-18 21:12:45.218307
+
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3f6b2a7c41'
+down_revision: Union[str, Sequence[str], None] = 'f1a6c3d8b925'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 12  # progress.PARTITION_MONTHS_AHEAD; later months come from `python schema.py partitions`
+
+
+def _create_partitions() -> None:
+    op.execute("CREATE TABLE IF NOT EXISTS media_progress_event_default PARTITION OF media_progress_event DEFAULT")
+    month = datetime.utcnow().date().replace(day=1)
+    for _ in range(MONTHS_AHEAD + 1):
+        following = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+        op.execute(
+            f"CREATE TABLE IF NOT EXISTS media_progress_event_{month:%Y%m} PARTITION OF media_progress_event "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+        )
+        month = following
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('media_progress_event',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('ts', sa.DateTime(), nullable=False),
+    sa.Column('media_id', sa.Integer(), nullable=False),
+    sa.Column('category', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('progress_from', sa.Integer(), nullable=False),
+    sa.Column('progress_to', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'ts', 'media_id'),
+    postgresql_partition_by='RANGE (ts)'
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        _create_partitions()
+    op.create_table('media_activity_daily',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('category', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('events', sa.Integer(), nullable=False),
+    sa.Column('progress', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'day', 'category')
+    )
+    op.create_table('media_activity_weekly',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('week', sa.Date(), nullable=False),
+    sa.Column('category', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('events', sa.Integer(), nullable=False),
+    sa.Column('progress', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'week', 'category')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('media_activity_weekly')
+    op.drop_table('media_activity_daily')
+    op.drop_table('media_progress_event')  # on PostgreSQL this drops its partitions too
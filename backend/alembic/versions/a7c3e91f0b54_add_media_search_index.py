@@ -0,0 +1,78 @@
+"""add media search text and full-text/trigram indexes
+
+Revision ID: a7c3e91f0b54
+Revises: 8b4f2d6e9a31
+Create Date: 2026-10-18 17:05:44.902117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e91f0b54'
+down_revision: Union[str, Sequence[str], None] = '8b4f2d6e9a31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# copies of search.py's DDL as of this revision; it must not follow later edits there
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public",
+    "CREATE INDEX IF NOT EXISTS ix_media_search_tsv ON media USING gin (to_tsvector('simple', search_text))",
+    "CREATE INDEX IF NOT EXISTS ix_media_search_trgm ON media USING gin (search_text gin_trgm_ops)",
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS media_fts USING fts5(search_text, content='media', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS media_fts_ai AFTER INSERT ON media BEGIN
+        INSERT INTO media_fts(rowid, search_text) VALUES (new.id, new.search_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS media_fts_ad AFTER DELETE ON media BEGIN
+        INSERT INTO media_fts(media_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS media_fts_au AFTER UPDATE OF search_text ON media BEGIN
+        INSERT INTO media_fts(media_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+        INSERT INTO media_fts(rowid, search_text) VALUES (new.id, new.search_text);
+    END""",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('media', sa.Column('search_text', sqlmodel.sql.sqltypes.AutoString(), nullable=False, server_default=''))
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("""
+            UPDATE media SET search_text = trim(media.name || ' ' || coalesce((
+                SELECT string_agg(tag.name, ' ') FROM mediataglink
+                JOIN tag ON tag.id = mediataglink.tag_id
+                WHERE mediataglink.media_id = media.id
+            ), ''))
+        """)
+        for statement in POSTGRES_DDL:
+            op.execute(statement)
+    elif dialect == 'sqlite':
+        op.execute("""
+            UPDATE media SET search_text = trim(media.name || ' ' || coalesce((
+                SELECT group_concat(tag.name, ' ') FROM mediataglink
+                JOIN tag ON tag.id = mediataglink.tag_id
+                WHERE mediataglink.media_id = media.id
+            ), ''))
+        """)
+        for statement in SQLITE_DDL:
+            op.execute(statement)
+        op.execute("INSERT INTO media_fts(media_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_media_search_trgm', table_name='media')
+        op.drop_index('ix_media_search_tsv', table_name='media')
+    elif dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS media_fts")
+    op.drop_column('media', 'search_text')
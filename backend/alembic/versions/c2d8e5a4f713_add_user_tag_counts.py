@@ -0,0 +1,47 @@
+"""add per-user tag usage counts
+
+Revision ID: c2d8e5a4f713
+Revises: a7c3e91f0b54
+Create Date: 2026-10-18 18:32:19.664380
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d8e5a4f713'
+down_revision: Union[str, Sequence[str], None] = 'a7c3e91f0b54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('usertagcount',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'tag_id')
+    )
+    op.create_index('ix_usertagcount_user_id_count', 'usertagcount', ['user_id', 'count'], unique=False)
+    op.execute("""
+        INSERT INTO usertagcount (user_id, tag_id, count)
+        SELECT media.user_id, mediataglink.tag_id, count(*)
+        FROM mediataglink JOIN media ON media.id = mediataglink.media_id
+        GROUP BY media.user_id, mediataglink.tag_id
+    """)
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE INDEX IF NOT EXISTS ix_tag_name_pattern ON tag (name text_pattern_ops)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_tag_name_pattern', table_name='tag')
+    op.drop_index('ix_usertagcount_user_id_count', table_name='usertagcount')
+    op.drop_table('usertagcount')
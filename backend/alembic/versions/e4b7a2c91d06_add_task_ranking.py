@@ -0,0 +1,34 @@
+"""add pairwise task ranking
+
+Revision ID: e4b7a2c91d06
+Revises: c2d8e5a4f713
+Create Date: 2026-10-18 19:05:41.218733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7a2c91d06'
+down_revision: Union[str, Sequence[str], None] = 'c2d8e5a4f713'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('task', sa.Column('ranked', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.add_column('task', sa.Column('upper_bound_id', sa.Integer(), nullable=True))
+    op.add_column('task', sa.Column('lower_bound_id', sa.Integer(), nullable=True))
+    op.create_index('ix_task_user_id_ranked_priority_score_id', 'task', ['user_id', 'ranked', 'priority_score', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_task_user_id_ranked_priority_score_id', table_name='task')
+    op.drop_column('task', 'lower_bound_id')
+    op.drop_column('task', 'upper_bound_id')
+    op.drop_column('task', 'ranked')
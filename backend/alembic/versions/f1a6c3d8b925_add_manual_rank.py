@@ -0,0 +1,63 @@
+"""add fractional-index manual order to tasks and media
+
+Revision ID: f1a6c3d8b925
+Revises: e4b7a2c91d06
+Create Date: 2026-10-18 19:41:07.552190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a6c3d8b925'
+down_revision: Union[str, Sequence[str], None] = 'e4b7a2c91d06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+RANK_TYPE = sa.String().with_variant(sa.String(collation="C"), "postgresql")
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+
+def _nth_key_sql(n: str, max_width: int = 5) -> str:
+    """SQL for the n-th (0-based) key of ordering.key_between(prev, None) from None:
+    a0..az, b00..bzz, ... (up to 62**5 keys per user)."""
+    def digit(expr: str, power: int) -> str:
+        return f"substr('{DIGITS}', CAST((({expr}) / {62 ** power}) % 62 + 1 AS INTEGER), 1)"
+
+    cases, base = [], 0
+    for width in range(1, max_width + 1):
+        offset = f"{n} - {base}"
+        key = " || ".join([f"'{chr(ord('a') + width - 1)}'"] + [digit(offset, p) for p in reversed(range(width))])
+        base += 62 ** width
+        cases.append(f"WHEN {n} < {base} THEN {key}")
+    return "CASE " + " ".join(cases) + " END"
+
+
+def _backfill(table_name: str) -> None:
+    # existing rows keep their creation order; one set-based UPDATE per table
+    op.execute(f"""
+        UPDATE {table_name} SET rank = numbered.rank
+        FROM (
+            SELECT id, {_nth_key_sql("n")} AS rank
+            FROM (SELECT id, row_number() OVER (PARTITION BY user_id ORDER BY id) - 1 AS n FROM {table_name}) AS positions
+        ) AS numbered
+        WHERE {table_name}.id = numbered.id
+    """)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table_name in ('task', 'media'):
+        op.add_column(table_name, sa.Column('rank', RANK_TYPE, nullable=True))
+        _backfill(table_name)
+        op.create_index(f'ix_{table_name}_user_id_rank_id', table_name, ['user_id', 'rank', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table_name in ('task', 'media'):
+        op.drop_index(f'ix_{table_name}_user_id_rank_id', table_name=table_name)
+        op.drop_column(table_name, 'rank')
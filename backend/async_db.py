@@ -0,0 +1,39 @@
+# async_db.py
+from fastapi import Depends
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import DATABASE_URL, ASYNC_DATABASE_URL
+from db import engine_options
+
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Swap a sync driver (psycopg2, pysqlite) for its asyncio counterpart."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r}")
+    return parsed.set(drivername=_ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+_async_engine = None
+
+
+def get_async_engine():
+    # created on first use so the sync mode never needs asyncpg/aiosqlite installed
+    global _async_engine
+    if _async_engine is None:
+        url = ASYNC_DATABASE_URL or to_async_url(DATABASE_URL)
+        _async_engine = create_async_engine(url, **engine_options(url))
+    return _async_engine
+
+
+async def get_async_session(engine=Depends(get_async_engine)):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
@@ -0,0 +1,426 @@
+# async_routes.py
+"""Async counterparts of the /me, /sync, /tasks, /media and /tags endpoints in main.py.
+
+Enabled with DATABASE_ASYNC=true: install_async_routes() swaps them in for
+the sync routes with the same path and method, keeping route order intact.
+Endpoints whose work lives in a sync helper (batch.py, patches.py,
+ordering.py, ...) run it on the request's AsyncSession via run_sync, and
+build their response there too, so no lazy load happens outside it.
+
+Left sync: /register and /login (bcrypt runs on its own pool either way),
+/events (holds no session while streaming), / and /metrics. Reads always use
+the primary's async engine: READ_DATABASE_URLS (replicas.py) only applies to
+the sync routes.
+"""
+from datetime import date, datetime
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from async_db import get_async_engine, get_async_session
+from auth import AuthUser, user_cache, user_from_token
+from batch import apply_media_batch, apply_task_batch, check_batch_size
+from config import EXPORT_CHUNK_SIZE, IMPORT_CHUNK_SIZE, SYNC_MAX_PAGE_SIZE, SYNC_PAGE_SIZE
+from instrumentation import TimedRoute
+from media_json import render_media_rows
+from models import (
+    BatchItemResult, Media, MediaBase, MediaBatchOp, MediaPatch, MediaRead, MoveRequest, RankingOutcome,
+    RankingPair, SyncRead, Task, TaskBase, TaskBatchOp, TaskPatch, TagUsage, User,
+)
+from ordering import move as move_item, needs_rebalance, rebalance_order
+from pagination import next_page, resolve_order
+from patches import expected_version, item_etag, patch_media, patch_task
+from progress import ActivityBucket, activity_window, get_activity
+from queries import media_rows_statement
+from ranking import TASK_ORDER, next_pair, record_outcome
+from search import search_media
+from stats import MediaStats, get_media_stats
+from sync import changes_since
+from tag_counts import autocomplete, facets
+from tags import resolve_tags
+from transfer import EXPORT_FORMATS, export_chunks_async, import_records
+from versions import record_changes, is_not_modified, validators, version_statement
+
+router = APIRouter(route_class=TimedRoute)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_async_session)) -> AuthUser:
+    user, payload = user_from_token(token)
+    if user is not None:
+        return user
+    if payload is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    db_user = (await session.exec(select(User).where(User.username == payload.get("sub")))).first()
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    user = AuthUser(id=db_user.id, username=db_user.username)
+    user_cache.put(token, user, payload.get("exp"))
+    return user
+
+
+async def _validators(session: AsyncSession, user_id: int, kind: str) -> dict:
+    row = (await session.exec(version_statement(user_id, kind))).first()
+    return validators(user_id, kind, *(row or (0, None)))
+
+
+async def _load_media(session: AsyncSession, media_id: int) -> Optional[Media]:
+    statement = select(Media).where(Media.id == media_id).options(selectinload(Media.tags))
+    return (await session.exec(statement)).first()
+
+
+async def _rebalance(engine, model, kind: str, user_id: int) -> None:
+    # background task: the request's session is closed by now
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        await session.run_sync(rebalance_order, model, kind, user_id)
+
+
+def _media_read(items) -> List[MediaRead]:
+    # inside run_sync: tags may still load lazily here
+    return [MediaRead.model_validate(item, from_attributes=True) for item in items]
+
+
+@router.get("/me")
+async def read_users_me(current_user: AuthUser = Depends(get_current_user_async)):
+    return {
+        "id": current_user.id,
+        "username": current_user.username
+    }
+
+
+@router.post("/tasks/", response_model=Task)
+async def create_task(new_task: TaskBase, current_user: AuthUser = Depends(get_current_user_async), session: AsyncSession = Depends(get_async_session)):
+    task = Task(title=new_task.title, description=new_task.description, user_id=current_user.id)
+    session.add(task)
+    await session.run_sync(record_changes, current_user.id, "task", [task])
+    await session.commit()
+    return task
+
+
+@router.get("/sync", response_model=SyncRead)
+async def sync(
+    since: int = Query(0, ge=0),
+    limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=SYNC_MAX_PAGE_SIZE),
+    current_user: AuthUser = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+):
+    result = await session.run_sync(changes_since, current_user.id, since, limit)
+    if since > result.cursor:
+        raise HTTPException(status_code=410, detail="Cursor is ahead of the server, full resync required")
+    return result
+
+
+@router.get("/tasks/")
+async def get_tasks(
+    request: Request,
+    response: Response,
+    sort: Literal["priority", "rank"] = "priority",
+    current_user: AuthUser = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+):
+    headers = await _validators(session, current_user.id, "task")
+    if is_not_modified(request, headers):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    statement = select(Task).where(Task.user_id == current_user.id)
+    statement = statement.order_by(*(TASK_ORDER if sort == "priority" else (Task.rank, Task.id)))
+    return (await session.exec(statement)).all()
+
+
+@router.post("/tasks/ranking/next", response_model=Optional[RankingPair])
+async def next_ranking_pair(current_user: AuthUser = Depends(get_current_user_async), session: AsyncSession = Depends(get_async_session)):
+    pair = await session.run_sync(next_pair, current_user.id)
+    return RankingPair(task=pair[0], other=pair[1]) if pair else None
+
+
+@router.post("/tasks/ranking/compare", response_model=Task)
+async def compare_tasks(outcome: RankingOutcome, current_user: AuthUser = Depends(get_current_user_async), session: AsyncSession = Depends(get_async_session)):
+    return await session.run_sync(record_outcome, current_user.id, outcome.winner_id, outcome.loser_id)
+
+
+@router.post("/tasks/batch", response_model=list[BatchItemResult])
+async def batch_tasks(ops: list[TaskBatchOp], current_user: AuthUser = Depends(get_current_user_async), session: AsyncSession = Depends(get_async_session)):
+    check_batch_size(ops)
+    return await session.run_sync(apply_task_batch, current_user.id, ops)
+
+
+@router.delete("/tasks/{task_id}")
+async def delete_task(task_id: int, current_user: AuthUser = Depends(get_current_user_async), session: AsyncSession = Depends(get_async_session)):
+    task = await session.get(Task, task_id)
+    if not task or task.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Task not found")
+    await session.delete(task)
+    await session.run_sync(record_changes, current_user.id, "task", (), [task_id])
+    await session.commit()
+    return {"ok": True}
+
+
+@router.patch("/tasks/{task_id}/move", response_model=Task)
+async def move_task(
+    task_id: int,
+    move: MoveRequest,
+    background_tasks: BackgroundTasks,
+    current_user: AuthUser = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+):
+    task = await session.run_sync(move_item, Task, "task", current_user.id, task_id, move.after_id)
+    if needs_rebalance(task):
+        background_tasks.add_task(_rebalance, session.bind, Task, "task", current_user.id)
+    return task
+
+
+@router.patch("/tasks/{task_id}", response_model=Task)
+async def patch_task_endpoint(
+    task_id: int,
+    patch: TaskPatch,
+    request: Request,
+    response: Response,
+    current_user: AuthUser = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+):
+    task = await session.run_sync(patch_task, current_user.id, task_id, patch, expected_version(request))
+    response.headers["ETag"] = item_etag("task", task.id, task.change_seq)
+    return task
+
+
+@router.put("/tasks/{task_id}", response_model=Task)
+async def update_task(
+    task_id: int,
+    updated_task: TaskBase,
+    current_user: AuthUser = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+):
+    task = await session.get(Task, task_id)
+    if not task or task.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Task not found")
+    task.title = updated_task.title
+    task.description = updated_task.description
+    session.add(task)
+    await session.run_sync(record_changes, current_user.id, "task", [task])
+    await session.commit()
+    return task
+
+
+@router.post("/media/", response_model=MediaRead)
+async def create_media(media: MediaBase, current_user: AuthUser = Depends(get_current_user_async), session: AsyncSession = Depends(get_async_session)):
+    tag_objs = await session.run_sync(resolve_tags, [tag.name for tag in media.tags])
+    new_media = Media(
+        name=media.name,
+        category=media.category,
+        status=media.status,
+        progress=media.progress,
+        rating=media.rating,
+        last_edited=datetime.now(),
+        user_id=current_user.id,
+        tags=tag_objs,
+    )
+    session.add(new_media)
+    await session.run_sync(record_changes, current_user.id, "media", [new_media])
+    await session.commit()
+    return await _load_media(session, new_media.id)
+
+
+@router.get("/media/", response_model=list[MediaRead])
+async def get_media(
+    request: Request,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    name: Optional[str] = None,
+    tag: list[str] = Query([]),
+    sort: Literal["name", "last_edited", "progress", "rank"] = "last_edited",
+    order: Optional[Literal["asc", "desc"]] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    current_user: AuthUser = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+):
+    headers = await _validators(session, current_user.id, "media")
+    if is_not_modified(request, headers):
+        return Response(status_code=304, headers=headers)
+
+    order = resolve_order(sort, order)
+    statement = media_rows_statement(
+        session.bind.dialect.name, current_user.id, sort, order,
+        category=category, status=status, name=name, tags=tag, limit=limit, cursor=cursor,
+    )
+    rows, next_cursor = next_page((await session.exec(statement)).all(), sort, order, limit)
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    # plain rows serialized by orjson; same bytes as response_model, without ORM/pydantic work
+    return Response(render_media_rows(rows), media_type="application/json", headers=headers)
+
+
+@router.post("/media/batch", response_model=list[BatchItemResult])
+async def batch_media(ops: list[MediaBatchOp], current_user: AuthUser = Depends(get_current_user_async), session: AsyncSession = Depends(get_async_session)):
+    check_batch_size(ops)
+    return await session.run_sync(apply_media_batch, current_user.id, ops)
+
+
+@router.get("/media/search", response_model=list[MediaRead])
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: AuthUser = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+):
+    return await session.run_sync(lambda s: _media_read(search_media(s, current_user.id, q, limit, offset)))
+
+
+@router.get("/media/stats", response_model=MediaStats)
+async def media_stats(current_user: AuthUser = Depends(get_current_user_async), session: AsyncSession = Depends(get_async_session)):
+    stats, _ = await session.run_sync(get_media_stats, current_user.id)
+    return stats
+
+
+@router.get("/media/activity", response_model=list[ActivityBucket])
+async def media_activity(
+    bucket: Literal["day", "week"] = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    category: Optional[str] = None,
+    current_user: AuthUser = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+):
+    start, end = activity_window(bucket, start, end)
+    return await session.run_sync(get_activity, current_user.id, bucket, start, end, category)
+
+
+@router.get("/tags/", response_model=list[TagUsage])
+async def tag_autocomplete(
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: AuthUser = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+):
+    return await session.run_sync(autocomplete, current_user.id, prefix, limit)
+
+
+@router.get("/tags/facets", response_model=list[TagUsage])
+async def tag_facets(
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: AuthUser = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+):
+    return await session.run_sync(facets, current_user.id, limit)
+
+
+@router.get("/media/export")
+async def export_media(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user: AuthUser = Depends(get_current_user_async),
+    engine=Depends(get_async_engine),
+):
+    async def stream():
+        # own session: the body is produced after the request's dependencies have exited
+        async with AsyncSession(engine) as session:
+            async for chunk in export_chunks_async(session, current_user.id, format, EXPORT_CHUNK_SIZE):
+                yield chunk
+
+    return StreamingResponse(
+        stream(),
+        media_type=EXPORT_FORMATS[format].media_type,
+        headers={"Content-Disposition": f'attachment; filename="media.{format}"'},
+    )
+
+
+@router.post("/media/import")
+async def import_media(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user: AuthUser = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+):
+    def apply_chunk(ops):
+        return session.run_sync(apply_media_batch, current_user.id, ops)
+
+    return await import_records(request.stream(), format, apply_chunk, IMPORT_CHUNK_SIZE)
+
+
+@router.delete("/media/{media_id}")
+async def delete_media(media_id: int, current_user: AuthUser = Depends(get_current_user_async), session: AsyncSession = Depends(get_async_session)):
+    media = await _load_media(session, media_id)
+    if not media or media.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Media item not found")
+    await session.delete(media)
+    await session.run_sync(record_changes, current_user.id, "media", (), [media_id])
+    await session.commit()
+    return {"ok": True}
+
+
+@router.put("/media/{media_id}", response_model=MediaRead)
+async def update_media(
+    media_id: int,
+    updated: MediaBase,
+    current_user: AuthUser = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+):
+    media = await _load_media(session, media_id)
+    if not media or media.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Media item not found")
+
+    if updated.progress != media.progress:
+        media.last_edited = datetime.now()
+    media.name = updated.name
+    media.category = updated.category
+    media.status = updated.status
+    media.progress = updated.progress
+    media.rating = updated.rating
+    media.tags = await session.run_sync(resolve_tags, [tag.name for tag in updated.tags])
+
+    session.add(media)
+    await session.run_sync(record_changes, current_user.id, "media", [media])
+    await session.commit()
+    return media
+
+
+@router.patch("/media/{media_id}/move", response_model=MediaRead)
+async def move_media(
+    media_id: int,
+    move: MoveRequest,
+    background_tasks: BackgroundTasks,
+    current_user: AuthUser = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+):
+    def run(sync_session):
+        media = move_item(sync_session, Media, "media", current_user.id, media_id, move.after_id)
+        return _media_read([media])[0], needs_rebalance(media)
+
+    result, rebalance = await session.run_sync(run)
+    if rebalance:
+        background_tasks.add_task(_rebalance, session.bind, Media, "media", current_user.id)
+    return result
+
+
+@router.patch("/media/{media_id}", response_model=MediaRead)
+async def patch_media_endpoint(
+    media_id: int,
+    patch: MediaPatch,
+    request: Request,
+    response: Response,
+    current_user: AuthUser = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+):
+    media = await session.run_sync(patch_media, current_user.id, media_id, patch, expected_version(request))
+    response.headers["ETag"] = item_etag("media", media["id"], media["change_seq"])
+    return media
+
+
+def install_async_routes(app: FastAPI) -> None:
+    """Replace the app's sync routes with the async ones above, in place."""
+    replacements = {
+        (route.path, frozenset(route.methods)): route
+        for route in router.routes
+        if isinstance(route, APIRoute)
+    }
+    for i, route in enumerate(app.router.routes):
+        if isinstance(route, APIRoute):
+            replacement = replacements.get((route.path, frozenset(route.methods)))
+            if replacement is not None:
+                app.router.routes[i] = replacement
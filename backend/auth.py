@@ -2,8 +2,34 @@
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional, Tuple
+import asyncio
+import threading
+import time
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from sqlalchemy import event
+from sqlmodel import Session
+
+from config import (
+    AUTH_TRUST_TOKEN_UID,
+    BCRYPT_ROUNDS,
+    PASSWORD_HASH_MAX_PENDING,
+    PASSWORD_HASH_WORKERS,
+    USER_CACHE_SIZE,
+    USER_CACHE_TTL,
+)
+from instrumentation import add_bcrypt_time
+from lru import LRUCache
+from models import User
+
+# hashes below BCRYPT_ROUNDS are reported by needs_update() and upgraded on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -11,6 +37,81 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(password, hashed)
 
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash/verify jobs are already queued."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated thread pool so it never occupies the
+    request threadpool. bcrypt releases the GIL, so threads scale with cores.
+
+    At most `max_pending` jobs may be running or queued; beyond that callers
+    get PasswordHasherBusy instead of waiting behind the backlog.
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 64):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+        self.completed = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.completed += 1
+                self.total_seconds += elapsed
+                self.max_seconds = max(self.max_seconds, elapsed)
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy()
+            self.pending += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._timed, fn, *args)
+        finally:
+            add_bcrypt_time(time.perf_counter() - start)  # includes queueing, as the request sees it
+            with self._lock:
+                self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Return (valid, new_hash); new_hash is set when the stored hash
+        uses outdated parameters and should be replaced."""
+        return await self._submit(pwd_context.verify_and_update, password, hashed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.pending,
+                "max_pending": self.max_pending,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "avg_seconds": self.total_seconds / self.completed if self.completed else 0.0,
+                "max_seconds": self.max_seconds,
+            }
+
+
+password_hasher = PasswordHasher(
+    workers=PASSWORD_HASH_WORKERS,
+    max_pending=PASSWORD_HASH_MAX_PENDING,
+)
+
 SECRET_KEY = "SUPER_SECRET_KEY_CHANGE_THIS"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
@@ -27,3 +128,75 @@ def decode_access_token(token: str):
         return payload
     except JWTError:
         return None
+
+
+class AuthUser(NamedTuple):
+    """Immutable, session-free view of the authenticated user."""
+    id: int
+    username: str
+
+
+class UserCache(LRUCache):
+    """LRU cache of verified token -> AuthUser.
+
+    An entry never outlives the token's `exp` claim, and `ttl` (seconds)
+    caps it further so changes made by other workers are picked up
+    eventually; this worker evicts a user's tokens as soon as it commits a
+    change to or deletion of their row (hooks below).
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 300):
+        super().__init__(maxsize, clock=time.time)  # wall clock, to compare with `exp`
+        self.ttl = ttl
+
+    def put(self, token: str, user: AuthUser, exp: Optional[float]) -> None:
+        expires = self.clock() + self.ttl
+        if exp is not None:
+            expires = min(expires, exp)
+        super().put(token, user, expires)
+
+    def evict_token(self, token: str) -> None:
+        self.pop(token)
+
+    def evict_user(self, user_id: int) -> None:
+        self.pop_where(lambda token, user: user.id == user_id)
+
+
+user_cache = UserCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+@event.listens_for(Session, "after_flush")
+def _note_changed_users(session, flush_context):
+    changed = session.info.setdefault("changed_user_ids", set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            changed.add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_changed_users(session):
+    # a rolled-back change leaves its ids behind; evicting them later costs one lookup
+    for user_id in session.info.pop("changed_user_ids", ()):
+        user_cache.evict_user(user_id)
+
+
+def user_from_token(token: str) -> Tuple[Optional[AuthUser], Optional[dict]]:
+    """Authenticate `token` without touching the database where possible.
+
+    Returns (user, payload): `user` is set on a cache hit or when the token's
+    "uid" claim is trusted; otherwise the caller looks up payload["sub"] and
+    caches the result. A payload of None means the token is invalid.
+    """
+    cached = user_cache.get(token)
+    if cached is not None:
+        return cached, {}
+    payload = decode_access_token(token)
+    if payload is None:
+        return None, None
+    username = payload.get("sub")
+    user_id = payload.get("uid")
+    if AUTH_TRUST_TOKEN_UID and isinstance(user_id, int) and username:
+        user = AuthUser(id=user_id, username=username)
+        user_cache.put(token, user, payload.get("exp"))
+        return user, payload
+    return None, payload
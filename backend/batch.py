@@ -0,0 +1,154 @@
+# batch.py
+"""Apply /media/batch and /tasks/batch operations in one transaction.
+
+Each helper validates every operation first, then issues one statement per
+kind of change (bulk INSERT, one SELECT for the rows to update, one DELETE)
+and returns a BatchItemResult per input entry, in input order. Items that
+fail validation or don't belong to the user are reported and skipped; the
+rest are committed together.
+"""
+from datetime import datetime
+from typing import Dict, List
+
+from fastapi import HTTPException
+from sqlalchemy import delete
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+
+from config import BATCH_MAX_SIZE
+from models import BatchItemResult, Media, MediaBatchOp, MediaTagLink, Task, TaskBatchOp
+from tag_counts import release_media_tags
+from tags import normalize_tag_names, resolve_tags
+from versions import record_changes
+
+
+def check_batch_size(ops: list):
+    if len(ops) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {BATCH_MAX_SIZE} operations)")
+
+
+def _validate(index: int, op, results: Dict[int, BatchItemResult]) -> bool:
+    if op.op in ("update", "delete") and op.id is None:
+        results[index] = BatchItemResult(index=index, op=op.op, ok=False, error="id is required")
+        return False
+    if op.op in ("create", "update") and op.data is None:
+        results[index] = BatchItemResult(index=index, op=op.op, ok=False, error="data is required")
+        return False
+    return True
+
+
+def _owned_ids(session: Session, model, user_id: int, ids) -> set:
+    if not ids:
+        return set()
+    return set(session.exec(select(model.id).where(model.user_id == user_id, model.id.in_(ids))).all())
+
+
+def apply_task_batch(session: Session, user_id: int, ops: List[TaskBatchOp]) -> List[BatchItemResult]:
+    results: Dict[int, BatchItemResult] = {}
+    valid = [(i, op) for i, op in enumerate(ops) if _validate(i, op, results)]
+
+    touched = _owned_ids(session, Task, user_id, {op.id for _, op in valid if op.op != "create"})
+    updates = {}
+    deletes = set()
+    created = []
+    for i, op in valid:
+        if op.op == "create":
+            created.append((i, Task(title=op.data.title, description=op.data.description, user_id=user_id)))
+        elif op.id not in touched:
+            results[i] = BatchItemResult(index=i, op=op.op, ok=False, id=op.id, error="Task not found")
+        elif op.op == "update":
+            updates[op.id] = op.data
+            results[i] = BatchItemResult(index=i, op=op.op, ok=True, id=op.id)
+        else:
+            deletes.add(op.id)
+            results[i] = BatchItemResult(index=i, op=op.op, ok=True, id=op.id)
+
+    updates = {task_id: data for task_id, data in updates.items() if task_id not in deletes}
+    changed = [task for _, task in created]
+    if updates:
+        for task in session.exec(select(Task).where(Task.id.in_(updates))).all():
+            task.title = updates[task.id].title
+            task.description = updates[task.id].description
+            changed.append(task)
+    if deletes:
+        session.exec(delete(Task).where(Task.id.in_(deletes)))
+    session.add_all([task for _, task in created])
+    if changed or deletes:
+        record_changes(session, user_id, "task", upserted=changed, deleted_ids=deletes)
+    session.commit()
+
+    for i, task in created:
+        results[i] = BatchItemResult(index=i, op="create", ok=True, id=task.id)
+    return [results[i] for i in range(len(ops))]
+
+
+def apply_media_batch(session: Session, user_id: int, ops: List[MediaBatchOp]) -> List[BatchItemResult]:
+    results: Dict[int, BatchItemResult] = {}
+    valid = [(i, op) for i, op in enumerate(ops) if _validate(i, op, results)]
+
+    # tags for the whole batch in one resolution
+    tag_by_name = {
+        tag.name: tag
+        for tag in resolve_tags(session, (t.name for _, op in valid if op.data for t in op.data.tags))
+    }
+
+    def tags_for(data):
+        return [tag_by_name[name] for name in normalize_tag_names(t.name for t in data.tags)]
+
+    touched = _owned_ids(session, Media, user_id, {op.id for _, op in valid if op.op != "create"})
+    updates = {}
+    deletes = set()
+    created = []
+    now = datetime.now()
+    for i, op in valid:
+        if op.op == "create":
+            data = op.data
+            media = Media(
+                name=data.name,
+                category=data.category,
+                status=data.status,
+                progress=data.progress,
+                rating=data.rating,
+                last_edited=op.last_edited or now,
+                user_id=user_id,
+                tags=tags_for(data),
+            )
+            # add right away: the tags are already in the session and back-populate Tag.media
+            session.add(media)
+            created.append((i, media))
+        elif op.id not in touched:
+            results[i] = BatchItemResult(index=i, op=op.op, ok=False, id=op.id, error="Media item not found")
+        elif op.op == "update":
+            updates[op.id] = op.data
+            results[i] = BatchItemResult(index=i, op=op.op, ok=True, id=op.id)
+        else:
+            deletes.add(op.id)
+            results[i] = BatchItemResult(index=i, op=op.op, ok=True, id=op.id)
+
+    # a delete wins over an update of the same item in the same batch
+    updates = {media_id: data for media_id, data in updates.items() if media_id not in deletes}
+    changed = [media for _, media in created]
+    if updates:
+        statement = select(Media).where(Media.id.in_(updates)).options(selectinload(Media.tags))
+        for media in session.exec(statement).all():
+            data = updates[media.id]
+            if data.progress != media.progress:
+                media.last_edited = now
+            media.name = data.name
+            media.category = data.category
+            media.status = data.status
+            media.progress = data.progress
+            media.rating = data.rating
+            media.tags = tags_for(data)
+            changed.append(media)
+    if deletes:
+        release_media_tags(session, user_id, deletes)
+        session.exec(delete(MediaTagLink).where(MediaTagLink.media_id.in_(deletes)))
+        session.exec(delete(Media).where(Media.id.in_(deletes)))
+    if changed or deletes:
+        record_changes(session, user_id, "media", upserted=changed, deleted_ids=deletes)
+    session.commit()
+
+    for i, media in created:
+        results[i] = BatchItemResult(index=i, op="create", ok=True, id=media.id)
+    return [results[i] for i in range(len(ops))]
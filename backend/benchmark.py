@@ -0,0 +1,393 @@
+# benchmark.py
+"""Load test for the API: seed data, drive a request mix at fixed concurrency, save JSON.
+
+    python benchmark.py --users 20 --media 200 --tags 10 --requests 2000 --concurrency 16 --output run.json
+    python benchmark.py ... --compare run.json    # print p95/throughput deltas against an earlier run
+    python benchmark.py --serialization --media 2000 --requests 20   # GET /media/ ORM vs fast path
+
+Data is seeded straight into DATABASE_URL (PostgreSQL or SQLite; --database-url
+overrides it). Unless --url points at a running server, uvicorn is started
+in-process on the same database, and every response carries the number of
+SQL statements it issued, so results include statements per request.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+
+PASSWORD = "benchmark-password"
+CATEGORIES = ["book", "manga", "anime", "series"]
+STATUSES = ["planned", "in progress", "completed", "dropped"]
+DEFAULT_MIX = "list=50,create=15,update=20,delete=5,login=5,register=5"
+
+_statements: ContextVar[Optional[list]] = ContextVar("statements", default=None)
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        op, _, weight = part.partition("=")
+        if op not in ("list", "create", "update", "delete", "login", "register"):
+            raise ValueError(f"Unknown operation in mix: {op!r}")
+        weights[op] = int(weight)
+    return weights
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+# --- seeding
+
+def seed(prefix: str, users: int, media: int, tags: int, rng: random.Random) -> Dict[str, List[int]]:
+    """Create users with media and tags; return {username: [media ids]}."""
+    from sqlmodel import SQLModel, Session
+
+    from auth import hash_password
+    from db import engine
+    from models import Media, User
+    from tags import resolve_tags
+
+    SQLModel.metadata.create_all(engine)
+    hashed = hash_password(PASSWORD)  # one bcrypt run for every seeded account
+    now = datetime.utcnow()
+    accounts = {}
+    with Session(engine) as session:
+        for u in range(users):
+            user = User(username=f"{prefix}-{u}", hashed_password=hashed)
+            session.add(user)
+            session.flush()
+            tag_objs = resolve_tags(session, [f"{prefix}-tag-{t}" for t in range(tags)])
+            items = [
+                Media(
+                    name=f"Item {u}-{m}",
+                    category=rng.choice(CATEGORIES),
+                    status=rng.choice(STATUSES),
+                    progress=rng.randrange(500),
+                    rating=rng.randrange(21),
+                    last_edited=now - timedelta(minutes=m),
+                    user_id=user.id,
+                    tags=rng.sample(tag_objs, k=min(3, len(tag_objs))),
+                )
+                for m in range(media)
+            ]
+            session.add_all(items)
+            session.commit()
+            accounts[user.username] = [item.id for item in items]
+    return accounts
+
+
+# --- in-process server with per-request statement counts
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _statements.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def counting(app):
+    """ASGI wrapper adding X-SQL-Statements (statements issued before the response started)."""
+    async def wrapped(scope, receive, send):
+        if scope["type"] != "http":
+            return await app(scope, receive, send)
+        counter = [0]
+        _statements.set(counter)
+
+        async def send_with_count(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-sql-statements", str(counter[0]).encode())]
+            await send(message)
+
+        await app(scope, receive, send_with_count)
+    return wrapped
+
+
+class Server:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        import uvicorn
+        from sqlalchemy import event
+
+        from config import DATABASE_ASYNC
+        from db import engine
+        from main import app
+
+        self.engines = [engine]
+        if DATABASE_ASYNC:
+            from async_db import get_async_engine
+            self.engines.append(get_async_engine().sync_engine)
+        for target in self.engines:
+            event.listen(target, "before_cursor_execute", _count_statement)
+        # lifespan off: seed() already created the schema, so skip the startup schema check
+        self.server = uvicorn.Server(uvicorn.Config(
+            counting(app), host=host, port=port, log_level="warning", lifespan="off",
+        ))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("uvicorn failed to start")
+            time.sleep(0.01)
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+
+        self.server.should_exit = True
+        self.thread.join()
+        for target in self.engines:
+            event.remove(target, "before_cursor_execute", _count_statement)
+
+
+# --- load generation
+
+def _media_body(rng: random.Random, name: str) -> dict:
+    return {
+        "name": name,
+        "category": rng.choice(CATEGORIES),
+        "status": rng.choice(STATUSES),
+        "progress": rng.randrange(500),
+        "rating": rng.randrange(21),
+        "tags": [{"name": f"bench-{rng.randrange(20)}"}],
+    }
+
+
+async def _login(client: httpx.AsyncClient, username: str) -> str:
+    response = await client.post("/login", params={"username": username, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def drive(base_url: str, accounts: Dict[str, List[int]], ops: List[str], concurrency: int, seed_value: int) -> list:
+    """Run `ops` with `concurrency` workers; return (op, status, seconds, statements) samples."""
+    rng = random.Random(seed_value)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        names = list(accounts)
+        tokens = dict(zip(names, await asyncio.gather(*(_login(client, name) for name in names))))
+        samples = []
+        pending = iter(enumerate(ops))
+
+        def request(i: int, op: str, username: str):
+            headers = {"Authorization": f"Bearer {tokens[username]}"}
+            ids = accounts[username]
+            if op == "list":
+                sort = rng.choice(["last_edited", "name", "progress"])
+                return op, client.get("/media/", params={"sort": sort, "limit": 50}, headers=headers)
+            if op == "create":
+                return op, client.post("/media/", json=_media_body(rng, f"New {i}"), headers=headers)
+            if op == "update":
+                return op, client.put(f"/media/{rng.choice(ids)}", json=_media_body(rng, f"Updated {i}"), headers=headers)
+            if op == "delete":
+                return op, client.delete(f"/media/{ids.pop(rng.randrange(len(ids)))}", headers=headers)
+            if op == "login":
+                return op, client.post("/login", params={"username": username, "password": PASSWORD})
+            return op, client.post("/register", params={"username": f"{username}-r{i}", "password": PASSWORD})
+
+        async def worker():
+            for i, op in pending:
+                username = rng.choice(names)
+                if op in ("update", "delete") and not accounts[username]:
+                    op = "create"
+                op, call = request(i, op, username)
+                start = time.perf_counter()
+                try:
+                    response = await call
+                except httpx.TransportError:
+                    # dropped connection (e.g. the server failed mid-response): count as an error
+                    samples.append((op, 599, time.perf_counter() - start, None))
+                    continue
+                elapsed = time.perf_counter() - start
+                if op == "create" and response.status_code == 200:
+                    accounts[username].append(response.json()["id"])
+                statements = response.headers.get("x-sql-statements")
+                samples.append((op, response.status_code, elapsed, int(statements) if statements else None))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return samples
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    def stats(group):
+        latencies = sorted(s[2] * 1000 for s in group)
+        counted = [s[3] for s in group if s[3] is not None]
+        return {
+            "requests": len(group),
+            "errors": sum(1 for s in group if s[1] >= 400),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "mean_ms": sum(latencies) / len(latencies) if latencies else None,
+            "sql_per_request": sum(counted) / len(counted) if counted else None,
+        }
+
+    overall = stats(samples)
+    overall["throughput_rps"] = len(samples) / elapsed if elapsed else None
+    overall["elapsed_s"] = elapsed
+    by_op = {op: stats([s for s in samples if s[0] == op]) for op in sorted({s[0] for s in samples})}
+    return {"overall": overall, "ops": by_op}
+
+
+def compare(current: dict, previous: dict) -> str:
+    def delta(new, old):
+        if new is None or not old:
+            return "n/a"
+        return f"{old:.1f} -> {new:.1f} ({(new - old) / old:+.0%})"
+
+    lines = [f"throughput_rps: {delta(current['overall']['throughput_rps'], previous['overall']['throughput_rps'])}"]
+    for op, result in current["ops"].items():
+        old = previous["ops"].get(op, {})
+        lines.append(f"{op:>8} p95_ms: {delta(result['p95_ms'], old.get('p95_ms'))}"
+                     f"  sql/req: {delta(result['sql_per_request'], old.get('sql_per_request'))}")
+    return "\n".join(lines)
+
+
+def run(args) -> dict:
+    rng = random.Random(args.seed)
+    prefix = args.prefix or f"bench-{int(time.time())}"
+    accounts = seed(prefix, args.users, args.media, args.tags, rng)
+    weights = parse_mix(args.mix)
+    ops = rng.choices(list(weights), weights=list(weights.values()), k=args.warmup + args.requests)
+
+    async def timed(base_url):
+        await drive(base_url, accounts, ops[:args.warmup], args.concurrency, args.seed)
+        start = time.perf_counter()
+        samples = await drive(base_url, accounts, ops[args.warmup:], args.concurrency, args.seed + 1)
+        return samples, time.perf_counter() - start
+
+    if args.url:
+        samples, elapsed = asyncio.run(timed(args.url))
+    else:
+        with Server() as base_url:
+            samples, elapsed = asyncio.run(timed(base_url))
+
+    from config import DATABASE_ASYNC, DATABASE_URL
+
+    result = summarize(samples, elapsed)
+    result["meta"] = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "database": DATABASE_URL.split("://")[0],
+        "async": DATABASE_ASYNC,
+        "users": args.users,
+        "media": args.media,
+        "tags": args.tags,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "mix": weights,
+        "seed": args.seed,
+    }
+    return result
+
+
+# --- GET /media/ serialization: ORM + MediaRead validation vs. rows + orjson
+
+def orm_media_json(session, user_id: int, sort: str = "last_edited", order: str = "desc") -> bytes:
+    """What response_model=list[MediaRead] produced before the fast path."""
+    from fastapi.encoders import jsonable_encoder
+
+    from models import MediaRead
+    from queries import media_list_statement
+
+    media = session.exec(media_list_statement(user_id, sort, order)).all()
+    content = jsonable_encoder([MediaRead.model_validate(m) for m in media])
+    # starlette JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def fast_media_json(session, user_id: int, sort: str = "last_edited", order: str = "desc") -> bytes:
+    from media_json import render_media_rows
+    from queries import media_rows_statement
+
+    statement = media_rows_statement(session.get_bind().dialect.name, user_id, sort, order)
+    return render_media_rows(session.exec(statement).all())
+
+
+def serialization_benchmark(media: int, tags: int, repeats: int, seed_value: int) -> dict:
+    """Time both list paths on one user with `media` items; their bytes must match."""
+    from sqlmodel import Session, select
+
+    from db import engine
+    from models import User
+
+    accounts = seed(f"bench-ser-{int(time.time())}", 1, media, tags, random.Random(seed_value))
+    with Session(engine) as session:
+        user_id = session.exec(select(User.id).where(User.username == next(iter(accounts)))).one()
+        result = {"media": media, "repeats": repeats}
+        outputs = {}
+        for name, fn in (("orm", orm_media_json), ("fast", fast_media_json)):
+            timings = []
+            for _ in range(repeats):
+                session.expunge_all()  # each request starts with an empty identity map
+                start = time.perf_counter()
+                outputs[name] = fn(session, user_id)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            result[f"{name}_p50_ms"] = percentile(timings, 50)
+            result[f"{name}_min_ms"] = timings[0]
+        result["identical"] = outputs["orm"] == outputs["fast"]
+        result["speedup"] = result["orm_p50_ms"] / result["fast_p50_ms"]
+    return result
+
+
+def use_database_url(url: str) -> None:
+    """Point config at `url`; config prefers TEST_DATABASE_URL, so that goes too."""
+    os.environ["DATABASE_URL"] = url
+    os.environ.pop("TEST_DATABASE_URL", None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="overrides DATABASE_URL (seeding and in-process server)")
+    parser.add_argument("--url", help="benchmark an already running server on the same database")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--media", type=int, default=100, help="media items per user")
+    parser.add_argument("--tags", type=int, default=10, help="tags per user")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--prefix", help="username prefix (default: unique per run)")
+    parser.add_argument("--output", help="write the JSON result here")
+    parser.add_argument("--compare", help="earlier JSON result to compare against")
+    parser.add_argument("--serialization", action="store_true",
+                        help="only compare GET /media/ serialization paths on --media items (--requests repeats)")
+    args = parser.parse_args(argv)
+    if args.database_url:
+        use_database_url(args.database_url)
+
+    if args.serialization:
+        result = serialization_benchmark(args.media, args.tags, args.requests, args.seed)
+        print(json.dumps(result, indent=2))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(result, f, indent=2)
+        return result
+
+    result = run(args)
+    print(json.dumps(result["overall"], indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(result, json.load(f)))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# db.py
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
+from sqlmodel import Session, create_engine
+
+from config import (
+    DATABASE_URL, DB_ECHO, DB_MAX_OVERFLOW, DB_NULL_POOL, DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE, DB_POOL_SIZE, DB_POOL_TIMEOUT,
+)
+from instrumentation import add_pool_wait
+
+
+class PoolStats:
+    """Checkout-wait and in-use gauges for one engine's pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def _checkout(self, *args):
+        with self._lock:
+            self.in_use += 1
+
+    def _checkin(self, *args):
+        with self._lock:
+            self.in_use -= 1
+
+    def attach(self, pool):
+        event.listen(pool, "checkout", self._checkout)
+        event.listen(pool, "checkin", self._checkin)
+
+    def stats(self, pool) -> dict:
+        with self._lock:
+            return {
+                "size": pool.size() if hasattr(pool, "size") else 0,
+                "in_use": self.in_use,
+                "overflow": pool.overflow() if hasattr(pool, "overflow") else 0,
+                "checkouts": self.checkouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited."""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            waited = time.perf_counter() - start
+            pool_stats.record_wait(waited)
+            add_pool_wait(waited)
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def engine_options(url: str) -> dict:
+    """create_engine kwargs from the DB_* settings, shared by the sync and async engines."""
+    options = {"echo": DB_ECHO, "pool_pre_ping": DB_POOL_PRE_PING}
+    if DB_NULL_POOL:
+        options["poolclass"] = NullPool
+    elif not _is_memory_sqlite(url):
+        # in-memory SQLite keeps its single-connection pool
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return options
+
+
+def _create_engine():
+    options = engine_options(DATABASE_URL)
+    if "pool_size" in options:
+        options["poolclass"] = TimedQueuePool
+    elif _is_memory_sqlite(DATABASE_URL) and "poolclass" not in options:
+        # one shared connection, so every thread sees the same in-memory database
+        options.update(poolclass=StaticPool, connect_args={"check_same_thread": False})
+    new_engine = create_engine(DATABASE_URL, **options)
+    pool_stats.attach(new_engine.pool)
+    return new_engine
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The primary engine, created on first use rather than at import."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _create_engine()
+    return _engine
+
+
+def __getattr__(name):
+    # `from db import engine` still works; it just creates the engine at that point
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def new_session(bind) -> Session:
+    """Session on an engine, or on a Connection already in a transaction.
+
+    With a Connection (the tests' per-test transaction, injected by overriding
+    get_engine) the session's commits and rollbacks only release or roll back
+    SAVEPOINTs, leaving the outer transaction to its owner.
+    """
+    return Session(bind, join_transaction_mode="create_savepoint")
+
+
+def get_session(engine=Depends(get_engine)):
+    """One session per request, shared by get_current_user and the handler."""
+    with new_session(engine) as session:
+        yield session
+
+
+# INSERT ... ON CONFLICT, by dialect
+_UPSERT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def upsert(
+    session: Session,
+    model,
+    values: List[Dict[str, Any]],
+    index_elements: List[str],
+    set_: Optional[Callable[[Any], Dict[str, Any]]] = None,
+    returning=None,
+):
+    """Insert `values`, resolving conflicts on `index_elements`.
+
+    set_(excluded) gives the columns to update on a conflict, with `excluded`
+    the row that was proposed; without it conflicting rows are skipped (DO
+    NOTHING). Only PostgreSQL and SQLite, the dialects the app runs on.
+    """
+    statement = _UPSERT_DIALECTS[session.get_bind().dialect.name](model).values(values)
+    if set_ is None:
+        statement = statement.on_conflict_do_nothing(index_elements=index_elements)
+    else:
+        statement = statement.on_conflict_do_update(index_elements=index_elements, set_=set_(statement.excluded))
+    if returning is not None:
+        statement = statement.returning(returning)
+    return session.execute(statement)
@@ -0,0 +1,254 @@
+# events.py
+"""Per-user change notifications for GET /events (server-sent events).
+
+record_changes() and the PATCH writers call queue_changes(); the session
+hooks below turn the queued rows into compact events
+{"entity", "id", "op", "version"} and publish them when the transaction
+commits, dropping them on rollback. `version` is the user's change_seq after
+the write, the same cursor /sync takes, and doubles as the SSE event id.
+
+Fan-out goes through `broker`, an in-process pub/sub keyed by user id. Each
+subscriber is an asyncio queue holding at most EVENTS_QUEUE_SIZE batches; a
+subscriber that falls that far behind is dropped (its stream ends with an
+`overflow` event and the client resyncs), so a slow consumer never buffers
+without bound or holds up the writer. An idle stream is one coroutine waiting
+on its queue: no thread and no database connection.
+
+With EVENTS_BACKEND=postgres a commit instead NOTIFYs EVENTS_CHANNEL inside
+its transaction (delivered only if it commits) and one LISTEN thread per
+worker feeds the local broker, so subscribers see writes made on any worker.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy import select as sql_select
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, create_engine
+from starlette.concurrency import run_in_threadpool
+
+from config import DATABASE_URL, EVENTS_BACKEND, EVENTS_CHANNEL, EVENTS_HEARTBEAT_SECONDS, EVENTS_QUEUE_SIZE
+
+logger = logging.getLogger("events")
+
+NOTIFY_BATCH = 100  # events per NOTIFY; keeps payloads well under PostgreSQL's 8000 bytes
+
+
+class Subscription:
+    """One /events stream: a bounded queue of event batches on its event loop."""
+
+    def __init__(self, broker: "Broker", user_id: int, maxsize: int):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+    def offer(self, batch: List[dict]):
+        """Runs on self.loop. A full queue drops the subscriber instead of blocking."""
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(batch)
+        except asyncio.QueueFull:
+            self.dropped = True
+            self.broker.count_drop()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)  # wakes the reader, which ends the stream
+
+    async def get(self, timeout: float) -> Optional[List[dict]]:
+        """Next batch, None once dropped; raises asyncio.TimeoutError when idle."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class Broker:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(self, user_id, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id: int, batch: List[dict]):
+        """Hand `batch` to the user's subscribers; safe to call from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+            self.published += len(batch)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, batch)
+            except RuntimeError:
+                self.unsubscribe(subscription)  # its loop is gone
+
+    def count_drop(self):
+        with self._lock:
+            self.dropped += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": sum(len(s) for s in self._subscribers.values()),
+                "published": self.published,
+                "dropped": self.dropped,
+            }
+
+
+broker = Broker(EVENTS_QUEUE_SIZE)
+
+
+# --- collecting changes in the writing session
+
+def queue_changes(session: Session, user_id: int, kind: str, version: int, upserted: Iterable = (), deleted_ids: Iterable[int] = ()):
+    """Queue events for `upserted` (rows, or ids of existing rows) and `deleted_ids`."""
+    pending = session.info.setdefault("change_events", [])
+    for item in upserted:
+        if isinstance(item, int):
+            pending.append((user_id, kind, item, "update", version))
+        else:
+            pending.append((user_id, kind, item, "update" if inspect(item).has_identity else "create", version))
+    pending.extend((user_id, kind, entity_id, "delete", version) for entity_id in deleted_ids)
+
+
+def _batches(pending) -> Dict[int, List[dict]]:
+    batches: Dict[int, List[dict]] = {}
+    for user_id, kind, item, op, version in pending:
+        # identity survives commit-time expiry, so this never loads the row
+        entity_id = item if isinstance(item, int) else inspect(item).identity[0]
+        batches.setdefault(user_id, []).append({"entity": kind, "id": entity_id, "op": op, "version": version})
+    return batches
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_postgres(session):
+    if EVENTS_BACKEND != "postgres" or not session.info.get("change_events"):
+        return
+    session.flush()  # new rows need their ids
+    for user_id, batch in _batches(session.info.pop("change_events")).items():
+        for start in range(0, len(batch), NOTIFY_BATCH):
+            payload = json.dumps({"user_id": user_id, "events": batch[start:start + NOTIFY_BATCH]}, separators=(",", ":"))
+            session.execute(sql_select(func.pg_notify(EVENTS_CHANNEL, payload)))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish(session):
+    pending = session.info.pop("change_events", None)
+    if pending:
+        for user_id, batch in _batches(pending).items():
+            broker.publish(user_id, batch)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("change_events", None)
+
+
+# --- PostgreSQL LISTEN, one thread per worker
+
+class PostgresListener(threading.Thread):
+    """LISTENs on EVENTS_CHANNEL over its own connection and republishes locally."""
+
+    def __init__(self, url: str, channel: str, target: Broker):
+        super().__init__(name="events-listener", daemon=True)
+        self.engine = create_engine(url, poolclass=NullPool)  # never takes a slot from the app's pool
+        self.channel = channel
+        self.target = target
+
+    def run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("LISTEN %s failed, reconnecting", self.channel)
+                time.sleep(1.0)
+
+    def _listen(self):
+        raw = self.engine.raw_connection()
+        try:
+            conn = raw.driver_connection
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+            while True:
+                if select.select([conn], [], [], 30.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    message = json.loads(conn.notifies.pop(0).payload)
+                    self.target.publish(message["user_id"], message["events"])
+        finally:
+            raw.close()
+
+
+_listener: Optional[PostgresListener] = None
+_listener_lock = threading.Lock()
+
+
+def start_listener():
+    """Start this worker's LISTEN thread (EVENTS_BACKEND=postgres only)."""
+    global _listener
+    if EVENTS_BACKEND != "postgres":
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = PostgresListener(DATABASE_URL, EVENTS_CHANNEL, broker)
+            _listener.start()
+
+
+# --- the SSE stream
+
+def _sse(name: str, data: dict, event_id: Optional[int] = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def event_stream(
+    user_id: int,
+    last_event_id: Optional[int] = None,
+    current_cursor: Optional[Callable[[], int]] = None,
+    heartbeat: float = EVENTS_HEARTBEAT_SECONDS,
+) -> AsyncIterator[str]:
+    """SSE body for one user; ends when the client disconnects or falls behind.
+
+    On reconnect (Last-Event-ID) it first sends `resync` if the user's cursor
+    moved while the client was away, so the client catches up through /sync.
+    """
+    start_listener()
+    subscription = broker.subscribe(user_id)  # before reading the cursor: no gap
+    try:
+        yield "retry: 3000\n\n"
+        if last_event_id is not None and current_cursor is not None:
+            cursor = await run_in_threadpool(current_cursor)
+            if cursor > last_event_id:
+                yield _sse("resync", {"since": last_event_id, "cursor": cursor}, cursor)
+        while True:
+            try:
+                batch = await subscription.get(heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"  # keeps proxies from closing the idle stream
+                continue
+            if batch is None:
+                yield _sse("overflow", {})
+                return
+            yield "".join(_sse("change", change, change["version"]) for change in batch)
+    finally:
+        broker.unsubscribe(subscription)
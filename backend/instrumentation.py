@@ -0,0 +1,296 @@
+# instrumentation.py
+"""Per-request timings: SQL statements, DB time, pool wait, bcrypt, serialization.
+
+RequestMetricsMiddleware opens a RequestTimings for each HTTP request in a
+context variable. Engine-wide cursor events, TimedQueuePool and the password
+hasher add to it; the middleware then
+
+* sends a Server-Timing header with the breakdown,
+* feeds per-route histograms rendered by metrics.py,
+* logs requests slower than SLOW_REQUEST_SECONDS with the statements they ran.
+
+startup_timings records how long the worker took to become ready and to
+serve its first request, measured from process start.
+
+Sync endpoints run in a copied context on the threadpool, so the timings
+object is mutated in place rather than replaced.
+"""
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import SLOW_REQUEST_MAX_STATEMENTS, SLOW_REQUEST_SECONDS
+
+logger = logging.getLogger("slow_requests")
+startup_logger = logging.getLogger("startup")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.bcrypt_seconds = 0.0
+        self.endpoint_done: Optional[float] = None
+        self.response_start: Optional[float] = None
+        self.statement_log: List[Tuple[float, str]] = []
+
+    @property
+    def serialize_seconds(self) -> float:
+        """Time between the endpoint returning and the response starting."""
+        if self.endpoint_done is None or self.response_start is None:
+            return 0.0
+        return max(0.0, self.response_start - self.endpoint_done)
+
+    def server_timing(self, total: float) -> str:
+        parts = [
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.statements} statements"',
+            f"pool;dur={self.pool_wait_seconds * 1000:.2f}",
+            f"bcrypt;dur={self.bcrypt_seconds * 1000:.2f}",
+            f"serialize;dur={self.serialize_seconds * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ]
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def add_pool_wait(seconds: float) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.pool_wait_seconds += seconds
+
+
+def add_bcrypt_time(seconds: float) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.bcrypt_seconds += seconds
+
+
+# --- SQL statements, for every engine (sync and the async engine's sync core)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    timings = _current.get()
+    if timings is None:
+        return
+    timings.statements += 1
+    timings.db_seconds += elapsed
+    if len(timings.statement_log) < SLOW_REQUEST_MAX_STATEMENTS:
+        timings.statement_log.append((elapsed, statement))
+
+
+# --- serialization: mark when the endpoint returned
+
+def _mark_endpoint_done():
+    timings = _current.get()
+    if timings is not None:
+        timings.endpoint_done = time.perf_counter()
+
+
+def _timed_endpoint(endpoint):
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _mark_endpoint_done()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _mark_endpoint_done()
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """APIRoute whose endpoint records when it returned (start of serialization)."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+# --- time to first request
+
+def _process_age() -> Optional[float]:
+    """Seconds since this process started (Linux /proc), None elsewhere."""
+    try:
+        with open("/proc/self/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimings:
+    """Seconds from process start (or, without /proc, from this import) to each milestone."""
+
+    def __init__(self):
+        self.origin = time.perf_counter() - (_process_age() or 0.0)
+        self.imported = time.perf_counter() - self.origin
+        self.ready: Optional[float] = None
+        self.first_request: Optional[float] = None
+
+    def mark_ready(self):
+        self.ready = time.perf_counter() - self.origin
+
+    def mark_first_request(self):
+        if self.first_request is None:
+            self.first_request = time.perf_counter() - self.origin
+            startup_logger.info(
+                "first request served %.0f ms after process start (ready at %s ms)",
+                self.first_request * 1000, "?" if self.ready is None else f"{self.ready * 1000:.0f}",
+            )
+
+
+startup_timings = StartupTimings()
+
+
+# --- per-route histograms
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class RouteMetrics:
+    """Histograms keyed by (method, route template)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], Dict[str, Histogram]] = {}
+
+    def observe(self, method: str, route: str, timings: RequestTimings, total: float):
+        key = (method, route)
+        with self._lock:
+            histograms = self._routes.get(key)
+            if histograms is None:
+                histograms = self._routes[key] = {
+                    "duration": Histogram(DURATION_BUCKETS),
+                    "statements": Histogram(STATEMENT_BUCKETS),
+                    "db": Histogram(DURATION_BUCKETS),
+                    "serialize": Histogram(DURATION_BUCKETS),
+                }
+            histograms["duration"].observe(total)
+            histograms["statements"].observe(timings.statements)
+            histograms["db"].observe(timings.db_seconds)
+            histograms["serialize"].observe(timings.serialize_seconds)
+
+    def snapshot(self) -> Dict[Tuple[str, str], Dict[str, Histogram]]:
+        with self._lock:
+            return {
+                key: {name: _copy(h) for name, h in histograms.items()}
+                for key, histograms in self._routes.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+
+def _copy(histogram: Histogram) -> Histogram:
+    copy = Histogram(histogram.buckets)
+    copy.counts = list(histogram.counts)
+    copy.count = histogram.count
+    copy.sum = histogram.sum
+    return copy
+
+
+route_metrics = RouteMetrics()
+
+
+def _route_name(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _log_slow(method: str, path: str, status: int, timings: RequestTimings, total: float):
+    lines = [f"{elapsed * 1000:8.2f} ms  {statement}" for elapsed, statement in timings.statement_log]
+    if timings.statements > len(timings.statement_log):
+        lines.append(f"... {timings.statements - len(timings.statement_log)} more")
+    logger.warning(
+        "slow request %s %s -> %s in %.1f ms (%s)\n%s",
+        method, path, status, total * 1000, timings.server_timing(total), "\n".join(lines),
+    )
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses are not buffered."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500
+        event_stream = False
+
+        async def send_with_timing(message):
+            nonlocal status, event_stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                event_stream = any(
+                    name.lower() == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", ())
+                )
+                timings.response_start = time.perf_counter()
+                header = timings.server_timing(timings.response_start - timings.start).encode()
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header),
+                    (b"timing-allow-origin", b"*"),  # let browsers read it cross-origin
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            total = time.perf_counter() - timings.start
+            startup_timings.mark_first_request()
+            # an /events stream lasts as long as the client stays: not a latency sample
+            if not event_stream:
+                route_metrics.observe(scope["method"], _route_name(scope), timings, total)
+                if SLOW_REQUEST_SECONDS and total >= SLOW_REQUEST_SECONDS:
+                    _log_slow(scope["method"], scope["path"], status, timings, total)
@@ -0,0 +1,84 @@
+# lru.py
+"""Bounded, thread-safe LRU map shared by the process-local caches
+(auth.UserCache, tags.TagCache, stats.StatsCache).
+
+Entries may carry an absolute expiry on the cache's clock; expired entries
+count as misses and are dropped when seen. maxsize <= 0 disables caching.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 10_000, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: Hashable, now: float, valid: Optional[Callable[[Any], bool]]) -> Optional[Any]:
+        # caller holds the lock
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires = entry
+            if expires is not None and expires <= now:
+                del self._entries[key]
+            elif valid is None or valid(value):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def get(self, key: Hashable, valid: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """Cached value, or None when absent, expired or rejected by `valid`."""
+        now = self.clock()
+        with self._lock:
+            return self._lookup(key, now, valid)
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        now = self.clock()
+        found = {}
+        with self._lock:
+            for key in keys:
+                value = self._lookup(key, now, None)
+                if value is not None:
+                    found[key] = value
+        return found
+
+    def put(self, key: Hashable, value: Any, expires: Optional[float] = None) -> None:
+        self.put_many({key: value}, expires)
+
+    def put_many(self, items: Dict[Hashable, Any], expires: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = (value, expires)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def pop_where(self, predicate: Callable[[Hashable, Any], bool]) -> None:
+        """Drop every entry for which predicate(key, value) holds; scans the whole cache."""
+        with self._lock:
+            for key in [k for k, (value, _) in self._entries.items() if predicate(k, value)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
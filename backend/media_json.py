@@ -0,0 +1,22 @@
+# media_json.py
+"""Fast JSON for GET /media/: rows from queries.media_rows_statement straight to bytes.
+
+The ORM path hydrates Media and Tag objects (identity map, relationship
+loading), validates them into MediaRead and encodes them with json.dumps.
+Here the columns come back as plain rows, tags arrive as one JSON string per
+row, and orjson writes the list. The output is byte-identical to
+response_model=list[MediaRead]: same field order, compact separators, raw
+UTF-8, ISO-8601 datetimes.
+"""
+from typing import Iterable
+
+import orjson
+
+
+def render_media_rows(rows: Iterable) -> bytes:
+    items = []
+    for row in rows:
+        item = row._asdict()
+        item["tags"] = orjson.loads(item["tags"])
+        items.append(item)
+    return orjson.dumps(items)
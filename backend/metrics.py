@@ -0,0 +1,93 @@
+# metrics.py
+"""Prometheus text exposition for the process-local counters and gauges."""
+from typing import Dict, List
+
+from auth import password_hasher, user_cache
+from db import get_engine, pool_stats
+from events import broker
+from instrumentation import route_metrics, startup_timings
+from replicas import get_read_router
+from stats import stats_cache
+from tags import tag_cache
+
+
+def _sample(name: str, value, labels: Dict[str, str] = None) -> str:
+    label_text = ""
+    if labels:
+        label_text = "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+    return f"{name}{label_text} {value}"
+
+
+def _metric(lines: List[str], name: str, kind: str, help_text: str, value) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    lines.append(_sample(name, value))
+
+
+# name -> help text; "duration"/"db"/"serialize" are seconds, "statements" a count
+ROUTE_HISTOGRAMS = {
+    "duration": ("http_request_duration_seconds", "Request latency by route."),
+    "statements": ("http_request_sql_statements", "SQL statements per request by route."),
+    "db": ("http_request_db_seconds", "Time spent in SQL per request by route."),
+    "serialize": ("http_request_serialize_seconds", "Response serialization time by route."),
+}
+
+
+def _route_histograms(lines: List[str]) -> None:
+    snapshot = route_metrics.snapshot()
+    for key, (name, help_text) in ROUTE_HISTOGRAMS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for (method, route), histograms in sorted(snapshot.items()):
+            histogram = histograms[key]
+            labels = {"method": method, "route": route}
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(_sample(f"{name}_bucket", count, {**labels, "le": repr(float(bound))}))
+            lines.append(_sample(f"{name}_bucket", histogram.count, {**labels, "le": "+Inf"}))
+            lines.append(_sample(f"{name}_sum", histogram.sum, labels))
+            lines.append(_sample(f"{name}_count", histogram.count, labels))
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+
+    pool = pool_stats.stats(get_engine().pool)
+    _metric(lines, "db_pool_size", "gauge", "Configured pool size.", pool["size"])
+    _metric(lines, "db_pool_in_use", "gauge", "Connections currently checked out.", pool["in_use"])
+    _metric(lines, "db_pool_overflow", "gauge", "Connections opened beyond pool_size.", pool["overflow"])
+    _metric(lines, "db_pool_checkouts_total", "counter", "Pool checkouts.", pool["checkouts"])
+    _metric(lines, "db_pool_wait_seconds_total", "counter", "Time spent waiting for a pooled connection.", pool["wait_seconds_total"])
+    _metric(lines, "db_pool_wait_seconds_max", "gauge", "Longest wait for a pooled connection.", pool["wait_seconds_max"])
+
+    hasher = password_hasher.stats()
+    _metric(lines, "password_hash_queue_depth", "gauge", "Hash/verify jobs running or queued.", hasher["queue_depth"])
+    _metric(lines, "password_hash_rejected_total", "counter", "Jobs rejected with 503 because the queue was full.", hasher["rejected"])
+    _metric(lines, "password_hash_completed_total", "counter", "Completed hash/verify jobs.", hasher["completed"])
+    _metric(lines, "password_hash_seconds_avg", "gauge", "Average hash/verify latency.", hasher["avg_seconds"])
+    _metric(lines, "password_hash_seconds_max", "gauge", "Slowest hash/verify job.", hasher["max_seconds"])
+
+    for cache_name, cache in (("user", user_cache), ("tag", tag_cache), ("stats", stats_cache)):
+        stats = cache.stats()
+        _metric(lines, f"{cache_name}_cache_size", "gauge", f"Entries in the {cache_name} cache.", stats["size"])
+        _metric(lines, f"{cache_name}_cache_hits_total", "counter", f"{cache_name.capitalize()} cache hits.", stats["hits"])
+        _metric(lines, f"{cache_name}_cache_misses_total", "counter", f"{cache_name.capitalize()} cache misses.", stats["misses"])
+
+    replica = get_read_router().stats()
+    _metric(lines, "db_read_replicas", "gauge", "Configured read replicas.", replica["replicas"])
+    _metric(lines, "db_read_replicas_healthy", "gauge", "Read replicas currently in rotation.", replica["healthy"])
+
+    events = broker.stats()
+    _metric(lines, "events_subscribers", "gauge", "Open /events streams in this worker.", events["subscribers"])
+    _metric(lines, "events_published_total", "counter", "Change events handed to the broker.", events["published"])
+    _metric(lines, "events_dropped_total", "counter", "/events streams closed for falling behind.", events["dropped"])
+
+    for name, help_text, value in (
+        ("process_ready_seconds", "Process start to end of startup (schema check).", startup_timings.ready),
+        ("process_first_request_seconds", "Process start to the first response served.", startup_timings.first_request),
+    ):
+        if value is not None:
+            _metric(lines, name, "gauge", help_text, value)
+
+    _route_histograms(lines)
+
+    return "\n".join(lines) + "\n"
@@ -1,25 +1,56 @@
 from sqlmodel import SQLModel, Field, Relationship
-from typing import Optional, List
-from datetime import datetime
+from sqlalchemy import Index, String, false
+from typing import Optional, List, Literal
+from datetime import date, datetime
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     username: str = Field(index=True, unique=True)
     hashed_password: str
+    # bumped on every write; validators for the ETag / Last-Modified of the list endpoints
+    media_version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    media_modified: Optional[datetime] = None
+    task_version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    task_modified: Optional[datetime] = None
+    # per-user change cursor for /sync; every write takes the next value
+    change_seq: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
 
 # Task model
+# manual-order keys (ordering.py) must compare bytewise, whatever the database collation
+RANK_TYPE = String().with_variant(String(collation="C"), "postgresql")
+
 class Task(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_task_user_id_change_seq", "user_id", "change_seq"),
+        # GET /tasks/ order: ranked tasks by priority, then unranked ones
+        Index("ix_task_user_id_ranked_priority_score_id", "user_id", "ranked", "priority_score", "id"),
+        Index("ix_task_user_id_rank_id", "user_id", "rank", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     description: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     priority_score: Optional[int] = 0
     user_id: Optional[int] = None
+    updated_at: Optional[datetime] = None
+    change_seq: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    # pairwise ranking (ranking.py): unranked tasks are narrowed down between
+    # the ranked tasks they are known to lose to / beat
+    ranked: bool = Field(default=False, sa_column_kwargs={"server_default": false()})
+    upper_bound_id: Optional[int] = None
+    lower_bound_id: Optional[int] = None
+    rank: Optional[str] = Field(default=None, sa_type=RANK_TYPE)  # manual order, set on insert
 
 class TaskBase(SQLModel):
     title: str
     description: Optional[str] = None
 
+# PATCH bodies: only the fields sent are written (patches.py)
+class TaskPatch(SQLModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+
 class TagCreate(SQLModel):
     name: str
 
@@ -31,6 +62,14 @@ class MediaBase(SQLModel):
     rating: int = 0
     tags: List[TagCreate] = []
 
+class MediaPatch(SQLModel):
+    name: Optional[str] = None
+    category: Optional[str] = None
+    status: Optional[str] = None
+    progress: Optional[int] = None
+    rating: Optional[int] = Field(default=None, ge=0, le=20)
+    tags: Optional[List[TagCreate]] = None
+
 class MediaTagLink(SQLModel, table=True):
     media_id: Optional[int] = Field(default=None, foreign_key="media.id", primary_key=True)
     tag_id: Optional[int] = Field(default=None, foreign_key="tag.id", primary_key=True)
@@ -41,7 +80,26 @@ class Tag(SQLModel, table=True):
 
     media: List["Media"] = Relationship(back_populates="tags", link_model=MediaTagLink)
 
+# How many of a user's media carry a tag; maintained by tag_counts.py on media writes
+class UserTagCount(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_usertagcount_user_id_count", "user_id", "count"),
+    )
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    tag_id: int = Field(foreign_key="tag.id", primary_key=True)
+    count: int = 0
+
 class Media(SQLModel, table=True):
+    # composite indexes backing the keyset-paginated sort orders of GET /media/
+    __table_args__ = (
+        Index("ix_media_user_id_name_id", "user_id", "name", "id"),
+        Index("ix_media_user_id_last_edited_id", "user_id", "last_edited", "id"),
+        Index("ix_media_user_id_progress_id", "user_id", "progress", "id"),
+        Index("ix_media_user_id_change_seq", "user_id", "change_seq"),
+        Index("ix_media_user_id_rank_id", "user_id", "rank", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     category: str  # e.g. book, manga, anime, series
@@ -50,12 +108,71 @@ class Media(SQLModel, table=True):
     rating: int = Field(default=0, ge=0, le=20)
     last_edited: datetime
     user_id: int = Field(foreign_key="user.id")
-    tags: List[Tag] = Relationship(back_populates="media", link_model=MediaTagLink)
+    updated_at: Optional[datetime] = None
+    change_seq: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    # name + tag names, kept current by search.py; feeds the full-text/trigram indexes
+    search_text: str = Field(default="", sa_column_kwargs={"server_default": ""})
+    rank: Optional[str] = Field(default=None, sa_type=RANK_TYPE)  # manual order, set on insert
+    # ordered so responses are stable (and match queries.tags_json)
+    tags: List[Tag] = Relationship(
+        back_populates="media", link_model=MediaTagLink, sa_relationship_kwargs={"order_by": "Tag.id"}
+    )
+
+# Deleted media/tasks, kept so /sync can report deletions
+class Tombstone(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_tombstone_user_id_change_seq", "user_id", "change_seq"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    entity: str  # "media" or "task"
+    entity_id: int
+    change_seq: int
+    deleted_at: datetime = Field(default_factory=datetime.utcnow)
+
+# Append-only log of media progress changes (progress.py). The key leads with
+# (user_id, ts), so a user's history over a time range is one index scan; on
+# PostgreSQL the table is range-partitioned by month on ts.
+class MediaProgressEvent(SQLModel, table=True):
+    __tablename__ = "media_progress_event"
+    __table_args__ = {"postgresql_partition_by": "RANGE (ts)"}
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    ts: datetime = Field(primary_key=True)  # UTC; a repeat within one tick extends the event (progress.py)
+    media_id: int = Field(primary_key=True)  # no foreign key: history outlives the media row
+    category: str
+    progress_from: int
+    progress_to: int
+
+# Rollups of media_progress_event per user, UTC day / week (its Monday) and category,
+# maintained with the events; GET /media/activity reads only these
+class MediaActivityDay(SQLModel, table=True):
+    __tablename__ = "media_activity_daily"
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    day: date = Field(primary_key=True)
+    category: str = Field(primary_key=True)
+    events: int = 0
+    progress: int = 0  # net change, so going back a chapter counts negative
+
+class MediaActivityWeek(SQLModel, table=True):
+    __tablename__ = "media_activity_weekly"
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    week: date = Field(primary_key=True)
+    category: str = Field(primary_key=True)
+    events: int = 0
+    progress: int = 0
 
 class TagRead(SQLModel):
     id: int
     name: str
 
+class TagUsage(SQLModel):
+    name: str
+    count: int
+
 class MediaRead(SQLModel):
     id: int
     name: str
@@ -65,4 +182,47 @@ class MediaRead(SQLModel):
     rating: int
     last_edited: datetime
     user_id: int
-    tags: List[TagRead] = []   # include tags here
\ No newline at end of file
+    rank: Optional[str] = None
+    change_seq: int = 0  # row version, for If-Match on PATCH
+    tags: List[TagRead] = []   # include tags here
+
+# Batch endpoints: one entry per item; `id` for update/delete, `data` for create/update
+class TaskBatchOp(SQLModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[int] = None
+    data: Optional[TaskBase] = None
+
+class MediaBatchOp(SQLModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[int] = None
+    data: Optional[MediaBase] = None
+    last_edited: Optional[datetime] = None  # creates only; defaults to now (used by imports)
+
+class BatchItemResult(SQLModel):
+    index: int
+    op: str
+    ok: bool
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class MoveRequest(SQLModel):
+    after_id: Optional[int] = None  # item the moved one goes right after; None = top
+
+class RankingPair(SQLModel):
+    task: Task  # the task being placed
+    other: Task  # ranked task to compare it with
+
+class RankingOutcome(SQLModel):
+    winner_id: int
+    loser_id: int
+
+class SyncDeleted(SQLModel):
+    media: List[int] = []
+    tasks: List[int] = []
+
+class SyncRead(SQLModel):
+    cursor: int  # the `since` of the next call
+    has_more: bool = False  # more changes after cursor; call again
+    media: List[MediaRead] = []
+    tasks: List[Task] = []
+    deleted: SyncDeleted = SyncDeleted()
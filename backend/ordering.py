@@ -0,0 +1,197 @@
+# ordering.py
+"""Persistent manual (drag-and-drop) order for tasks and media.
+
+`rank` holds a fractional index: a base-62 string key that sorts
+lexicographically (binary collation). Moving an item computes a key
+strictly between its new neighbours, so a move writes one row no matter
+how long the list is. Keys start with an integer part whose length is
+encoded in the head character ("a0".."az", "b00".., like the
+fractional-indexing scheme), so appending grows keys logarithmically; only
+repeated inserts into the same gap make them long, and those are rewritten
+by a background rebalance.
+"""
+from collections import defaultdict
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import event, func
+from sqlmodel import Session, select
+
+from config import RANK_REBALANCE_LENGTH
+from db import new_session
+from models import Media, Task, User
+from versions import record_changes
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+INTEGER_ZERO = "a0"
+SMALLEST_INTEGER = "A" + "0" * 26
+
+
+def _midpoint(a: str, b: Optional[str]) -> str:
+    """Fraction digits strictly between a and b (b=None means +infinity)."""
+    if b is not None:
+        n = 0
+        while (a[n] if n < len(a) else "0") == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else len(DIGITS)
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"Invalid rank key head: {head!r}")
+
+
+def _integer_part(key: str) -> str:
+    return key[:_integer_length(key[0])]
+
+
+def _increment_integer(x: str) -> Optional[str]:
+    head, digits = x[0], list(x[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) + 1
+        if d < len(DIGITS):
+            digits[i] = DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = "0"
+    if head == "Z":
+        return INTEGER_ZERO
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append("0")
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement_integer(x: str) -> Optional[str]:
+    head, digits = x[0], list(x[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) - 1
+        if d >= 0:
+            digits[i] = DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = "z"
+    if head == "a":
+        return "Zz"
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append("z")
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def key_between(a: Optional[str], b: Optional[str]) -> str:
+    """A key sorting strictly between a and b; None means the start/end of the list."""
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"{a!r} >= {b!r}")
+    if a is None:
+        if b is None:
+            return INTEGER_ZERO
+        int_b = _integer_part(b)
+        if int_b == SMALLEST_INTEGER:
+            return int_b + _midpoint("", b[len(int_b):])
+        if int_b < b:
+            return int_b
+        key = _decrement_integer(int_b)
+        if key is None:
+            raise ValueError("Cannot decrement any further")
+        return key
+    int_a = _integer_part(a)
+    if b is None:
+        key = _increment_integer(int_a)
+        return key if key is not None else int_a + _midpoint(a[len(int_a):], None)
+    int_b = _integer_part(b)
+    if int_a == int_b:
+        return int_a + _midpoint(a[len(int_a):], b[len(int_b):])
+    key = _increment_integer(int_a)
+    if key is not None and key < b:
+        return key
+    return int_a + _midpoint(a[len(int_a):], None)
+
+
+@event.listens_for(Session, "before_flush")
+def _assign_ranks(session, flush_context, instances):
+    """Append new tasks/media to the end of the owner's manual order."""
+    pending = defaultdict(list)
+    for obj in session.new:
+        if isinstance(obj, (Task, Media)) and obj.rank is None:
+            pending[(type(obj), obj.user_id)].append(obj)
+    with session.no_autoflush:
+        for (model, user_id), objs in pending.items():
+            last = session.exec(select(func.max(model.rank)).where(model.user_id == user_id)).one()
+            for obj in sorted(objs, key=lambda o: o.id or 0):
+                last = obj.rank = key_between(last, None)
+
+
+def _lock_order(session: Session, user_id: int) -> None:
+    """Serialize moves and rebalances of one user's order: each locks the user
+    row before it reads any rank, so none computes keys from a stale list."""
+    session.exec(select(User.id).where(User.id == user_id).with_for_update()).first()
+
+
+def move(session: Session, model, kind: str, user_id: int, item_id: int, after_id: Optional[int]):
+    """Place an item right after `after_id` (None: at the top) by rewriting only its rank."""
+    _lock_order(session, user_id)
+    not_found = HTTPException(status_code=404, detail=f"{model.__name__} not found")
+    item = session.get(model, item_id)
+    if not item or item.user_id != user_id:
+        raise not_found
+    statement = select(model.rank).where(model.user_id == user_id, model.id != item_id)
+    prev_rank = None
+    if after_id is not None:
+        if after_id == item_id:
+            raise HTTPException(status_code=400, detail="Cannot move an item after itself")
+        prev = session.get(model, after_id)
+        if not prev or prev.user_id != user_id:
+            raise not_found
+        prev_rank = prev.rank
+        statement = statement.where(model.rank > prev_rank)
+    next_rank = session.exec(statement.order_by(model.rank).limit(1)).first()
+
+    item.rank = key_between(prev_rank, next_rank)
+    record_changes(session, user_id, kind, upserted=[item])
+    session.commit()
+    session.refresh(item)
+    return item
+
+
+def needs_rebalance(item) -> bool:
+    return len(item.rank) > RANK_REBALANCE_LENGTH
+
+
+def rebalance_order(session: Session, model, kind: str, user_id: int) -> None:
+    """Rewrite one user's keys as short, evenly growing keys, and commit."""
+    _lock_order(session, user_id)
+    items = session.exec(select(model).where(model.user_id == user_id).order_by(model.rank, model.id)).all()
+    changed = []
+    key = None
+    for item in items:
+        key = key_between(key, None)
+        if item.rank != key:
+            item.rank = key
+            changed.append(item)
+    if changed:
+        record_changes(session, user_id, kind, upserted=changed)
+        session.commit()
+
+
+def rebalance(engine, model, kind: str, user_id: int) -> None:
+    """rebalance_order() on its own session; run as a background task."""
+    with new_session(engine) as session:
+        rebalance_order(session, model, kind, user_id)
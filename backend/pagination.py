@@ -0,0 +1,74 @@
+# pagination.py
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# sort key -> (column name, default direction); mirrors the sort options in MediaFilters.tsx
+MEDIA_SORTS = {
+    "name": ("name", "asc"),
+    "last_edited": ("last_edited", "desc"),
+    "progress": ("progress", "desc"),
+    "rank": ("rank", "asc"),  # manual order (ordering.py)
+}
+
+# JSON type a cursor's sort value must have (last_edited is an ISO string)
+_CURSOR_VALUE_TYPES = {
+    "name": str,
+    "last_edited": str,
+    "progress": int,
+    "rank": str,
+}
+
+
+def _is_a(value: Any, expected: type) -> bool:
+    return isinstance(value, expected) and not isinstance(value, bool)
+
+
+def encode_cursor(sort: str, order: str, value: Any, row_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, order, value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> Tuple[Any, int]:
+    """Return (sort value, id) of the last row of the previous page."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cur_sort, cur_order, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cur_sort != sort or cur_order != order:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    if not _is_a(row_id, int) or not _is_a(value, _CURSOR_VALUE_TYPES[sort]):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if sort == "last_edited":
+        try:
+            value = datetime.fromisoformat(value)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, row_id
+
+
+def keyset_filter(column, id_column, order: str, value: Any, row_id: int):
+    """Rows strictly after (value, row_id) in (column, id) order."""
+    if order == "asc":
+        return or_(column > value, and_(column == value, id_column > row_id))
+    return or_(column < value, and_(column == value, id_column < row_id))
+
+
+def resolve_order(sort: str, order: Optional[str]) -> str:
+    return order or MEDIA_SORTS[sort][1]
+
+
+def next_page(rows: list, sort: str, order: str, limit: Optional[int]):
+    """Trim the extra look-ahead row; return (rows, cursor of the next page or None)."""
+    if not limit or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(sort, order, getattr(last, MEDIA_SORTS[sort][0]), last.id)
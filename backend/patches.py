@@ -0,0 +1,144 @@
+# patches.py
+"""PATCH /media/{id} and /tasks/{id}: partial bodies written as one UPDATE.
+
+Only the fields present in the body are SET, in a single UPDATE ... RETURNING
+that also stamps change_seq/updated_at, so no ORM object is loaded or
+refreshed. For media, `tags` (when sent) is diffed against the current links:
+only added links are inserted and only removed ones deleted, and the per-user
+tag counts are adjusted by the same delta. A progress change is also logged
+to the progress history (progress.py), which needs one extra read of the old
+value.
+
+Each row's change_seq doubles as its version: responses carry it as the
+ETag `"<kind>-<id>-<change_seq>"`, and an If-Match header turns into an extra
+`change_seq = ...` condition on the UPDATE, so a stale write fails with 412
+without a read-modify-write round trip.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from sqlalchemy import case, delete, insert, literal, update
+from sqlmodel import Session, select
+
+from events import queue_changes
+from models import Media, MediaPatch, MediaTagLink, Tag, Task, TaskPatch
+from progress import ProgressChange, record_progress
+from queries import MEDIA_READ_COLUMNS
+from replicas import mark_written
+from search import search_document
+from tag_counts import apply_deltas
+from tags import resolve_tags
+from versions import bump_version
+
+
+def item_etag(kind: str, item_id: int, change_seq: int) -> str:
+    return f'"{kind}-{item_id}-{change_seq}"'
+
+
+def expected_version(request: Request) -> Optional[int]:
+    """change_seq required by If-Match; None when absent or "*"."""
+    if_match = request.headers.get("if-match")
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        # accepts the ETag we send ("media-12-345") or a bare change_seq
+        return int(if_match.strip().removeprefix("W/").strip('"').rsplit("-", 1)[-1])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed If-Match header")
+
+
+def _changed_fields(patch, nullable=()) -> dict:
+    fields = patch.model_dump(exclude_unset=True)
+    for name, value in fields.items():
+        if value is None and name not in nullable:
+            raise HTTPException(status_code=422, detail=f"{name} cannot be null")
+    return fields
+
+
+def _run_update(session: Session, model, kind: str, user_id: int, item_id: int, values: dict, expected: Optional[int], returning):
+    """One UPDATE of the row, stamped with a fresh change_seq; raises 404/412 if it matched nothing."""
+    seq = bump_version(session, user_id, kind)
+    statement = update(model).where(model.id == item_id, model.user_id == user_id)
+    if expected is not None:
+        statement = statement.where(model.change_seq == expected)
+    values = {**values, "change_seq": seq, "updated_at": datetime.utcnow()}
+    row = session.execute(statement.values(values).returning(*returning)).first()
+    if row is None:
+        # failure path only: tell a missing row from a version mismatch
+        exists = session.exec(select(model.id).where(model.id == item_id, model.user_id == user_id)).first()
+        session.rollback()
+        if exists is None:
+            raise HTTPException(status_code=404, detail=f"{'Media item' if model is Media else 'Task'} not found")
+        raise HTTPException(status_code=412, detail="Version mismatch, reload and retry")
+    mark_written(session, user_id)
+    queue_changes(session, user_id, kind, seq, [item_id])
+    return row
+
+
+def patch_task(session: Session, user_id: int, task_id: int, patch: TaskPatch, expected: Optional[int]) -> Task:
+    fields = _changed_fields(patch, nullable=("description",))
+    row = _run_update(session, Task, "task", user_id, task_id, fields, expected, Task.__table__.columns)
+    session.commit()
+    return Task.model_validate(row._asdict())
+
+
+def _current_tags(session: Session, media_id: int) -> List[Tuple[int, str]]:
+    return list(session.exec(
+        select(Tag.id, Tag.name)
+        .join(MediaTagLink, MediaTagLink.tag_id == Tag.id)
+        .where(MediaTagLink.media_id == media_id)
+        .order_by(Tag.id)
+    ).all())
+
+
+def patch_media(session: Session, user_id: int, media_id: int, patch: MediaPatch, expected: Optional[int]) -> Dict:
+    """Apply `patch`; return the MediaRead fields of the updated row."""
+    fields = _changed_fields(patch)
+    tag_names = fields.pop("tags", None)
+
+    values = dict(fields)
+    if "progress" in values:
+        # same rule as PUT: last_edited moves only when progress actually changes
+        values["last_edited"] = case((Media.progress != values["progress"], datetime.now()), else_=Media.last_edited)
+
+    current = None
+    new_tags = None
+    if tag_names is not None:
+        new_tags = sorted(((t.id, t.name) for t in resolve_tags(session, (t["name"] for t in tag_names))))
+    if new_tags is not None or "name" in values:
+        current = _current_tags(session, media_id)
+        final = new_tags if new_tags is not None else current
+        # search.py keeps search_text current for ORM writes; this UPDATE bypasses it
+        suffix = search_document("", (name for _, name in final))
+        name = literal(values["name"]) if "name" in values else Media.name
+        values["search_text"] = name + suffix
+
+    before = None
+    if "progress" in values:
+        # the UPDATE cannot return the old value for the progress history; lock and read it first
+        before = session.exec(
+            select(Media.progress).where(Media.id == media_id, Media.user_id == user_id).with_for_update()
+        ).first()
+
+    row = _run_update(session, Media, "media", user_id, media_id, values, expected, MEDIA_READ_COLUMNS)
+    if before is not None:
+        record_progress(session, [ProgressChange(user_id, media_id, row.category, before, row.progress)])
+
+    if new_tags is not None:
+        old_ids = {tag_id for tag_id, _ in current}
+        new_ids = {tag_id for tag_id, _ in new_tags}
+        added, removed = new_ids - old_ids, old_ids - new_ids
+        if added:
+            session.execute(insert(MediaTagLink), [{"media_id": media_id, "tag_id": t} for t in added])
+        if removed:
+            session.execute(delete(MediaTagLink).where(
+                MediaTagLink.media_id == media_id, MediaTagLink.tag_id.in_(removed)
+            ))
+        deltas = {(user_id, t): 1 for t in added}
+        deltas.update({(user_id, t): -1 for t in removed})
+        apply_deltas(session, deltas)
+    session.commit()
+
+    tags = new_tags if new_tags is not None else (current if current is not None else _current_tags(session, media_id))
+    return {**row._asdict(), "tags": [{"id": tag_id, "name": name} for tag_id, name in tags]}
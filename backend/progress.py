@@ -0,0 +1,162 @@
+# progress.py
+"""Media progress history and the rollups behind GET /media/activity.
+
+A media row only holds its current progress, so every change of it is also
+appended to media_progress_event (user, time, item, from -> to). A
+before_flush hook records ORM writes (PUT, batch, the async routes);
+patches.py calls record_progress() itself because its UPDATE bypasses the
+ORM. In the same flush the changes are added to media_activity_daily and
+media_activity_weekly with one upsert each, so /media/activity reads at most
+one row per bucket and category: its cost depends on the range asked for,
+never on how many events have piled up. The event table is only read to
+rebuild rollups or for ad hoc analysis.
+
+On PostgreSQL media_progress_event is range-partitioned by month, so old
+history can be detached or dropped a month at a time. Partitions are created
+PARTITION_MONTHS_AHEAD months ahead (`python schema.py partitions`, run
+monthly); a DEFAULT partition catches anything past that.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import event, inspect
+from sqlmodel import Session, SQLModel, select
+
+from db import upsert
+from models import Media, MediaActivityDay, MediaActivityWeek, MediaProgressEvent
+
+PARTITION_MONTHS_AHEAD = 12
+MAX_BUCKETS = {"day": 366, "week": 260}
+DEFAULT_BUCKETS = {"day": 365, "week": 52}
+
+class ProgressChange(NamedTuple):
+    user_id: int
+    media_id: int
+    category: str
+    before: int
+    after: int
+
+
+class ActivityBucket(SQLModel):
+    start: date  # the day, or the Monday of the week
+    category: str
+    events: int
+    progress: int
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def _add_to_rollup(session: Session, model, bucket_column: str, bucket: date, totals: Counter, counts: Counter):
+    rows = [
+        {"user_id": user_id, bucket_column: bucket, "category": category, "events": n, "progress": totals[(user_id, category)]}
+        for (user_id, category), n in counts.items()
+    ]
+    upsert(session, model, rows, ["user_id", bucket_column, "category"], lambda excluded: {
+        "events": model.events + excluded.events,
+        "progress": model.progress + excluded.progress,
+    })
+
+
+def record_progress(session: Session, changes: Iterable[ProgressChange], ts: Optional[datetime] = None) -> None:
+    """Append events for `changes` and add them to the day and week rollups.
+
+    An event is keyed by (user, ts, item): a second change to the same item
+    within one clock tick extends that event to the new progress instead of
+    failing the write. The rollups still count both changes.
+    """
+    changes = [c for c in changes if c.before != c.after]
+    if not changes:
+        return
+    ts = ts or datetime.utcnow()
+    events = {}
+    for c in changes:
+        event_row = events.setdefault((c.user_id, c.media_id), {
+            "user_id": c.user_id, "ts": ts, "media_id": c.media_id, "category": c.category, "progress_from": c.before,
+        })
+        event_row["progress_to"] = c.after
+    upsert(session, MediaProgressEvent, list(events.values()), ["user_id", "ts", "media_id"], lambda excluded: {
+        "category": excluded.category,
+        "progress_to": excluded.progress_to,
+    })
+    counts: Counter = Counter()
+    totals: Counter = Counter()
+    for c in changes:
+        counts[(c.user_id, c.category)] += 1
+        totals[(c.user_id, c.category)] += c.after - c.before
+    _add_to_rollup(session, MediaActivityDay, "day", ts.date(), totals, counts)
+    _add_to_rollup(session, MediaActivityWeek, "week", week_start(ts.date()), totals, counts)
+
+
+@event.listens_for(Session, "before_flush")
+def _track_progress(session, flush_context, instances):
+    changes = []
+    for obj in session.dirty:
+        if isinstance(obj, Media):
+            history = inspect(obj).attrs.progress.history
+            if history.added and history.deleted:
+                changes.append(ProgressChange(obj.user_id, obj.id, obj.category, history.deleted[0], history.added[0]))
+    record_progress(session, changes)
+
+
+def activity_window(bucket: str, start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+    """First and last bucket for a /media/activity request; 400 if reversed or too long."""
+    step = timedelta(days=1 if bucket == "day" else 7)
+    end = end or datetime.utcnow().date()
+    start = start or end - step * (DEFAULT_BUCKETS[bucket] - 1)
+    if bucket == "week":
+        start, end = week_start(start), week_start(end)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start is after end")
+    if (end - start) // step >= MAX_BUCKETS[bucket]:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BUCKETS[bucket]} {bucket}s per request")
+    return start, end
+
+
+def get_activity(
+    session: Session, user_id: int, bucket: str, start: date, end: date, category: Optional[str] = None
+) -> List[ActivityBucket]:
+    model, column = (MediaActivityDay, MediaActivityDay.day) if bucket == "day" else (MediaActivityWeek, MediaActivityWeek.week)
+    statement = (
+        select(column, model.category, model.events, model.progress)
+        .where(model.user_id == user_id, column >= start, column <= end)
+        .order_by(column, model.category)
+    )
+    if category is not None:
+        statement = statement.where(model.category == category)
+    rows = session.exec(statement).all()
+    return [ActivityBucket(start=row[0], category=row[1], events=row[2], progress=row[3]) for row in rows]
+
+
+# --- monthly partitions of media_progress_event (PostgreSQL)
+
+def _next_month(month: date) -> date:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def create_partitions(connection, months_ahead: int = PARTITION_MONTHS_AHEAD, today: Optional[date] = None) -> List[str]:
+    """Create the DEFAULT partition and one per month from this one on; idempotent."""
+    if connection.dialect.name != "postgresql":
+        return []
+    table = MediaProgressEvent.__tablename__
+    connection.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+    names = []
+    month = (today or datetime.utcnow().date()).replace(day=1)
+    for _ in range(months_ahead + 1):
+        following = _next_month(month)
+        name = f"{table}_{month:%Y%m}"
+        connection.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+        )
+        names.append(name)
+        month = following
+    return names
+
+
+@event.listens_for(MediaProgressEvent.__table__, "after_create")
+def _partitions_after_create(target, connection, **kw):
+    create_partitions(connection)
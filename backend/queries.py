@@ -0,0 +1,150 @@
+# queries.py
+from typing import List, Optional
+
+from sqlalchemy import Text, cast, func, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import selectinload
+from sqlmodel import col, select
+
+from models import Media, MediaTagLink, Tag
+from pagination import MEDIA_SORTS, decode_cursor, keyset_filter
+
+
+def _filter_media_list(
+    statement,
+    user_id: int,
+    sort: str,
+    order: str,
+    category: Optional[str],
+    status: Optional[str],
+    name: Optional[str],
+    tags: List[str],
+    limit: Optional[int],
+    cursor: Optional[str],
+):
+    sort_column = getattr(Media, MEDIA_SORTS[sort][0])
+
+    statement = statement.where(Media.user_id == user_id)
+    if category:
+        statement = statement.where(Media.category == category)
+    if status:
+        statement = statement.where(Media.status == status)
+    if name:
+        statement = statement.where(col(Media.name).icontains(name, autoescape=True))  # % and _ match literally
+    tag_names = {t.strip().lower() for t in tags if t.strip()}
+    if tag_names:
+        # media must carry every requested tag
+        tagged = (
+            select(MediaTagLink.media_id)
+            .join(Tag, Tag.id == MediaTagLink.tag_id)
+            .where(Tag.name.in_(tag_names))
+            .group_by(MediaTagLink.media_id)
+            .having(func.count() == len(tag_names))
+        )
+        statement = statement.where(Media.id.in_(tagged))
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort, order)
+        statement = statement.where(keyset_filter(sort_column, Media.id, order, value, last_id))
+
+    if order == "asc":
+        statement = statement.order_by(sort_column.asc(), Media.id.asc())
+    else:
+        statement = statement.order_by(sort_column.desc(), Media.id.desc())
+    if limit:
+        # fetch one extra row to know whether another page exists
+        statement = statement.limit(limit + 1)
+    return statement
+
+
+def media_list_statement(
+    user_id: int,
+    sort: str,
+    order: str,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    name: Optional[str] = None,
+    tags: List[str] = (),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+):
+    """SELECT of ORM Media (tags eager-loaded) for one page of a user's media."""
+    statement = _filter_media_list(select(Media), user_id, sort, order, category, status, name, tags, limit, cursor)
+    return statement.options(selectinload(Media.tags))
+
+
+def media_rows_statement(
+    dialect_name: str,
+    user_id: int,
+    sort: str,
+    order: str,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    name: Optional[str] = None,
+    tags: List[str] = (),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+):
+    """Same page as media_list_statement, as plain rows of MediaRead columns + tags JSON."""
+    columns = [*MEDIA_READ_COLUMNS, tags_json(dialect_name).label("tags")]
+    return _filter_media_list(select(*columns), user_id, sort, order, category, status, name, tags, limit, cursor)
+
+
+# MediaRead field order (minus tags), so rows serialize like the response model
+MEDIA_READ_COLUMNS = (
+    Media.id, Media.name, Media.category, Media.status, Media.progress,
+    Media.rating, Media.last_edited, Media.user_id, Media.rank, Media.change_seq,
+)
+
+
+def tags_json(dialect_name: str):
+    """Correlated subquery: a media row's tags as a JSON array of {"id", "name"}, ordered by id."""
+    if dialect_name == "postgresql":
+        agg = func.json_agg(aggregate_order_by(func.json_build_object(literal_column("'id'"), Tag.id, literal_column("'name'"), Tag.name), Tag.id))
+        inner = (
+            select(agg)
+            .select_from(MediaTagLink)
+            .join(Tag, Tag.id == MediaTagLink.tag_id)
+            .where(MediaTagLink.media_id == Media.id)
+            .correlate(Media)
+            .scalar_subquery()
+        )
+        return func.coalesce(cast(inner, Text), "[]")
+    # SQLite (< 3.44) has no ORDER BY inside aggregates: aggregate an ordered subquery
+    ordered = (
+        select(Tag.id, Tag.name)
+        .join(MediaTagLink, MediaTagLink.tag_id == Tag.id)
+        .where(MediaTagLink.media_id == Media.id)
+        .order_by(Tag.id)
+        .correlate(Media)
+        .subquery()
+    )
+    return (
+        select(func.json_group_array(func.json_object(literal_column("'id'"), ordered.c.id, literal_column("'name'"), ordered.c.name)))
+        .select_from(ordered)
+        .correlate(Media)
+        .scalar_subquery()
+    )
+
+
+def tag_names_json(dialect_name: str):
+    """Aggregate of a media row's tag names as a JSON array string ("[]" if none)."""
+    if dialect_name == "postgresql":
+        agg = func.json_agg(Tag.name).filter(Tag.name.isnot(None))
+        return func.coalesce(cast(agg, Text), "[]")
+    return func.coalesce(func.json_group_array(Tag.name).filter(Tag.name.isnot(None)), "[]")
+
+
+def media_export_statement(user_id: int, dialect_name: str):
+    """One row per media item with its tags pre-aggregated, ordered by id for streaming."""
+    return (
+        select(
+            Media.name, Media.category, Media.status, Media.progress, Media.rating, Media.last_edited,
+            tag_names_json(dialect_name).label("tags"),
+        )
+        .select_from(Media)
+        .outerjoin(MediaTagLink, MediaTagLink.media_id == Media.id)
+        .outerjoin(Tag, Tag.id == MediaTagLink.tag_id)
+        .where(Media.user_id == user_id)
+        .group_by(Media.id)
+        .order_by(Media.id)
+    )
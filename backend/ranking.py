@@ -0,0 +1,179 @@
+# ranking.py
+"""Pairwise priority ranking for tasks (binary insertion).
+
+Ranked tasks form a total order by priority_score (higher = more
+important). An unranked task is placed by comparing it with the median
+ranked task still possible for it; each answer halves the candidates, so
+placing a task takes about log2(n) comparisons. The bounds of the search
+are stored on the task as ids of ranked neighbours, so it survives
+restarts, other workers, and renumbering of scores.
+
+Scores are spaced SPACING apart so an insert usually writes one row; when
+two neighbours (or a task and the end of the 32-bit range) have no gap left
+the user's ranked tasks are renumbered.
+
+Finding the next pair places tasks whose position is already settled, so it
+is a POST: GET /tasks/ stays free of writes.
+"""
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func
+from sqlmodel import Session, select
+
+from models import Task
+from versions import record_changes
+
+SPACING = 1 << 16
+MAX_SCORE = 2**31 - 1
+
+# list order for GET /tasks/: ranked tasks by priority, then unranked newest first
+TASK_ORDER = (Task.ranked.desc(), Task.priority_score.desc(), Task.id.desc())
+
+
+def _ranked(user_id: int):
+    return and_(Task.user_id == user_id, Task.ranked == True)  # noqa: E712
+
+
+def _score_of(session: Session, user_id: int, task_id: Optional[int]) -> Optional[int]:
+    """Score of a bound, or None when open (never set, or the task is gone/unranked)."""
+    if task_id is None:
+        return None
+    return session.exec(select(Task.priority_score).where(_ranked(user_id), Task.id == task_id)).first()
+
+
+def _candidates(session: Session, task: Task):
+    """Condition for ranked tasks still between the task's bounds."""
+    upper = _score_of(session, task.user_id, task.upper_bound_id)
+    lower = _score_of(session, task.user_id, task.lower_bound_id)
+    condition = _ranked(task.user_id)
+    if upper is not None:
+        condition = and_(condition, Task.priority_score < upper)
+    if lower is not None:
+        condition = and_(condition, Task.priority_score > lower)
+    return condition, upper, lower
+
+
+def _renumber(session: Session, user_id: int) -> List[Task]:
+    """Respread the user's ranked tasks evenly, centred on 0.
+
+    The spacing shrinks below SPACING once that many tasks would not fit in
+    the 32-bit score column, leaving at least one step free at each end.
+    """
+    tasks = session.exec(
+        select(Task).where(_ranked(user_id)).order_by(Task.priority_score.desc(), Task.id.desc())
+    ).all()
+    spacing = min(SPACING, 2 * MAX_SCORE // (len(tasks) + 1))
+    bottom = -((len(tasks) - 1) * spacing // 2)
+    for i, ranked in enumerate(tasks):
+        ranked.priority_score = bottom + (len(tasks) - 1 - i) * spacing
+    return tasks
+
+
+def _above(score: int) -> Optional[int]:
+    if score + SPACING <= MAX_SCORE:
+        return score + SPACING
+    return (score + MAX_SCORE + 1) // 2 if score < MAX_SCORE else None
+
+
+def _below(score: int) -> Optional[int]:
+    if score - SPACING >= -MAX_SCORE:
+        return score - SPACING
+    return (score - MAX_SCORE) // 2 if score > -MAX_SCORE else None
+
+
+def _gap_score(upper: Optional[int], lower: Optional[int], top: Optional[int]) -> Optional[int]:
+    """A free score between the bounds, None when there is none (renumber first)."""
+    if upper is None and lower is None:
+        return 0 if top is None else _above(top)
+    if upper is None:
+        return _above(lower)
+    if lower is None:
+        return _below(upper)
+    return (upper + lower) // 2 if upper - lower > 1 else None
+
+
+def _place(session: Session, task: Task, upper: Optional[int], lower: Optional[int]) -> List[Task]:
+    """Give `task` a score strictly between its bounds; return every row changed."""
+    changed = [task]
+    top = session.exec(select(func.max(Task.priority_score)).where(_ranked(task.user_id))).one()
+    score = _gap_score(upper, lower, top)
+    if score is None:
+        changed += _renumber(session, task.user_id)
+        upper = _score_of(session, task.user_id, task.upper_bound_id)
+        lower = _score_of(session, task.user_id, task.lower_bound_id)
+        top = session.exec(select(func.max(Task.priority_score)).where(_ranked(task.user_id))).one()
+        score = _gap_score(upper, lower, top)
+    task.priority_score = score
+    task.ranked = True
+    task.upper_bound_id = None
+    task.lower_bound_id = None
+    return changed
+
+
+def next_pair(session: Session, user_id: int) -> Optional[Tuple[Task, Task]]:
+    """Oldest unranked task and the median ranked task it could still go next to.
+
+    Tasks whose position is already determined (or the very first task) are
+    placed on the way, so None means every task is ranked.
+    """
+    while True:
+        task = session.exec(
+            select(Task).where(Task.user_id == user_id, Task.ranked == False).order_by(Task.id)  # noqa: E712
+        ).first()
+        if task is None:
+            return None
+        condition, upper, lower = _candidates(session, task)
+        remaining = session.exec(select(func.count()).select_from(Task).where(condition)).one()
+        if remaining == 0:
+            record_changes(session, user_id, "task", upserted=_place(session, task, upper, lower))
+            session.commit()
+            continue
+        median = session.exec(
+            select(Task).where(condition).order_by(Task.priority_score.desc(), Task.id.desc()).offset(remaining // 2)
+        ).first()
+        return task, median
+
+
+def record_outcome(session: Session, user_id: int, winner_id: int, loser_id: int) -> Task:
+    """Apply "winner has higher priority than loser"; return the task that moved or narrowed."""
+    winner = session.get(Task, winner_id)
+    loser = session.get(Task, loser_id)
+    if not winner or not loser or winner.user_id != user_id or loser.user_id != user_id or winner_id == loser_id:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    if winner.ranked and loser.ranked:
+        if winner.priority_score > loser.priority_score:
+            return winner
+        # contradicts the current order: move the winner just above the loser
+        above = session.exec(
+            select(Task).where(_ranked(user_id), Task.priority_score > loser.priority_score, Task.id != winner.id)
+            .order_by(Task.priority_score).limit(1)
+        ).first()
+        winner.ranked = False
+        winner.upper_bound_id = above.id if above else None
+        winner.lower_bound_id = loser.id
+        session.flush()
+        moving = winner
+    elif winner.ranked or loser.ranked:
+        moving, ranked = (loser, winner) if winner.ranked else (winner, loser)
+        # only ever tighten a bound, so out-of-order answers cannot widen the search
+        if moving is winner:
+            current = _score_of(session, user_id, moving.lower_bound_id)
+            if current is None or ranked.priority_score > current:
+                moving.lower_bound_id = ranked.id
+        else:
+            current = _score_of(session, user_id, moving.upper_bound_id)
+            if current is None or ranked.priority_score < current:
+                moving.upper_bound_id = ranked.id
+    else:
+        raise HTTPException(status_code=400, detail="At least one of the tasks must already be ranked")
+
+    condition, upper, lower = _candidates(session, moving)
+    changed = [moving]
+    if session.exec(select(func.count()).select_from(Task).where(condition)).one() == 0:
+        changed = _place(session, moving, upper, lower)
+    record_changes(session, user_id, "task", upserted=changed)
+    session.commit()
+    session.refresh(moving)
+    return moving
@@ -0,0 +1,203 @@
+# replicas.py
+"""Route read-only requests to PostgreSQL read replicas.
+
+With READ_DATABASE_URLS set, get_read_engine() hands out a
+replica engine (round-robin over the healthy ones) and everything else keeps
+using the primary (db.get_engine()). Falls back to the primary when no replica is
+configured or healthy, and for any user who wrote within the last
+READ_YOUR_WRITES_SECONDS: record_changes() notes the user in session.info
+and the after_commit hook below starts their window.
+
+The window has to hold on every worker, not just the one that took the
+write. LastWriteMiddleware answers a committed write with an X-Last-Write
+header (unix time of the commit); the client sends it back on its next
+requests and engine_for() keeps those on the primary until the window has
+passed. Workers compare it with their own wall clock, so hosts need NTP-level
+agreement; a value from the future is ignored rather than trusted, which
+bounds what a forged header can do to pinning one client to the primary for
+a window. The in-process window still covers clients that drop the header.
+
+Health: a replica that raises a disconnect error is taken out of rotation
+and re-probed with SELECT 1 at most every REPLICA_HEALTH_INTERVAL seconds.
+"""
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, text
+from sqlmodel import Session, create_engine
+
+from config import READ_DATABASE_URLS, READ_YOUR_WRITES_SECONDS, REPLICA_HEALTH_INTERVAL
+from db import engine_options, get_engine
+
+LAST_WRITE_HEADER = "X-Last-Write"
+CLOCK_SKEW_SECONDS = 1.0
+
+# commit times of the current request's writes, filled by the after_commit hook
+_request_writes: ContextVar[Optional[list]] = ContextVar("request_writes", default=None)
+
+
+class RecentWriters:
+    """user id -> end of their read-your-writes window."""
+
+    def __init__(self, window: float):
+        self.window = window
+        self._lock = threading.Lock()
+        self._until: Dict[int, float] = {}
+
+    def mark(self, user_id: int):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._until) > 10_000:
+                self._until = {uid: t for uid, t in self._until.items() if t > now}
+            self._until[user_id] = now + self.window
+
+    def is_recent(self, user_id: Optional[int]) -> bool:
+        if user_id is None:
+            return False
+        with self._lock:
+            until = self._until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._until.clear()
+
+
+class Replica:
+    def __init__(self, replica_engine, health_interval: float):
+        self.engine = replica_engine
+        self.health_interval = health_interval
+        self.healthy = True
+        self.next_check = 0.0
+        event.listen(replica_engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        if context.is_disconnect:
+            self.mark_down()
+
+    def mark_down(self):
+        self.healthy = False
+        self.next_check = time.monotonic() + self.health_interval
+
+    def available(self) -> bool:
+        if not self.healthy and time.monotonic() >= self.next_check:
+            try:
+                with self.engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                self.healthy = True
+            except Exception:
+                self.mark_down()
+        return self.healthy
+
+
+class ReadRouter:
+    def __init__(self, primary, replica_engines: List, window: float, health_interval: float):
+        self.primary = primary
+        self.replicas = [Replica(e, health_interval) for e in replica_engines]
+        self.writers = RecentWriters(window)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def wrote_recently(self, last_write: Optional[str]) -> bool:
+        """Whether an X-Last-Write value falls inside the read-your-writes window."""
+        try:
+            age = time.time() - float(last_write)
+        except (TypeError, ValueError):
+            return False
+        return -CLOCK_SKEW_SECONDS <= age < self.writers.window
+
+    def engine_for(self, user_id: Optional[int], primary=None, last_write: Optional[str] = None):
+        """Replica for this user's reads, or the primary (`primary` if given)."""
+        primary = self.primary if primary is None else primary
+        if not self.replicas or self.writers.is_recent(user_id) or self.wrote_recently(last_write):
+            return primary
+        with self._lock:
+            start = next(self._counter)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if replica.available():
+                return replica.engine
+        return primary
+
+    def stats(self) -> dict:
+        return {
+            "replicas": len(self.replicas),
+            "healthy": sum(1 for r in self.replicas if r.healthy),
+        }
+
+
+def _create_replica_engines(urls: List[str]) -> List:
+    return [create_engine(url, **engine_options(url)) for url in urls]
+
+
+_read_router: Optional[ReadRouter] = None
+_read_router_lock = threading.Lock()
+
+
+def get_read_router() -> ReadRouter:
+    """Built on first use, like the primary engine (db.get_engine)."""
+    global _read_router
+    if _read_router is None:
+        with _read_router_lock:
+            if _read_router is None:
+                _read_router = ReadRouter(
+                    get_engine(), _create_replica_engines(READ_DATABASE_URLS),
+                    READ_YOUR_WRITES_SECONDS, REPLICA_HEALTH_INTERVAL,
+                )
+    return _read_router
+
+
+def mark_written(session: Session, user_id: int):
+    """Start `user_id`'s read-your-writes window once `session` commits."""
+    session.info.setdefault("written_user_ids", set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _start_write_windows(session):
+    user_ids = session.info.pop("written_user_ids", ())
+    for user_id in user_ids:
+        get_read_router().writers.mark(user_id)
+    writes = _request_writes.get()
+    if user_ids and writes is not None:
+        writes.append(time.time())
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_write_windows(session):
+    session.info.pop("written_user_ids", None)
+
+
+def read_engine(user_id: Optional[int], primary=None, last_write: Optional[str] = None):
+    return get_read_router().engine_for(user_id, primary, last_write)
+
+
+class LastWriteMiddleware:
+    """Adds X-Last-Write to responses of requests that committed a write.
+
+    Pure ASGI, like RequestMetricsMiddleware. Sync endpoints run in a copied
+    context, so the list is appended to rather than replaced.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        writes: list = []
+        token = _request_writes.set(writes)
+
+        async def send_with_marker(message):
+            if message["type"] == "http.response.start" and writes:
+                message["headers"] = list(message.get("headers", [])) + [
+                    (LAST_WRITE_HEADER.lower().encode(), f"{writes[-1]:.3f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_marker)
+        finally:
+            _request_writes.reset(token)
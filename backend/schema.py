@@ -0,0 +1,129 @@
+# schema.py
+"""Schema management, kept out of the request path.
+
+Workers no longer run create_all on boot. With SCHEMA_STARTUP=check (the
+default) startup reads alembic_version in one query and refuses to start if
+it is not the head of alembic/versions; creating or migrating the schema is
+an explicit step:
+
+    python schema.py upgrade    # alembic upgrade head
+    python schema.py create     # create_all on an empty database, stamped at head
+    python schema.py check      # exit 1 unless the database is at head
+    python schema.py partitions # PostgreSQL: create the coming months' history partitions
+"""
+import argparse
+import logging
+import os
+import sys
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import SQLModel
+
+import models  # noqa: F401  registers the tables on SQLModel.metadata
+import progress  # and the partitions created with media_progress_event
+import search  # noqa: F401  and the full-text index DDL that create_all emits
+from config import DATABASE_URL, SCHEMA_HEAD
+from db import get_engine
+
+logger = logging.getLogger("startup")
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+
+class SchemaMismatch(RuntimeError):
+    pass
+
+
+def alembic_config():
+    from alembic.config import Config
+
+    return Config(ALEMBIC_INI)
+
+
+def head_revision() -> str:
+    """Head of alembic/versions; reads the migration scripts, not the database."""
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def current_revision(engine) -> Optional[str]:
+    """Revision recorded in the database, or None when it was never stamped."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except DBAPIError:
+        return None  # no alembic_version table
+
+
+def check_schema(engine, head: Optional[str] = None) -> str:
+    head = head or head_revision()
+    current = current_revision(engine)
+    if current != head:
+        raise SchemaMismatch(
+            f"database schema is at {current or 'no revision'}, this build expects {head}; "
+            "run `python schema.py upgrade` (or `python schema.py create` on an empty database)"
+        )
+    return head
+
+
+def create_schema(engine):
+    """create_all, then stamp head so later checks and upgrades start from the
+    right place. A database that already has a revision keeps it: create_all
+    only adds missing tables, it does not bring old ones up to head."""
+    from alembic import command
+
+    SQLModel.metadata.create_all(engine)
+    if current_revision(engine) is None:
+        with engine.begin() as conn:
+            config = alembic_config()
+            config.attributes["connection"] = conn  # stamp this engine's database (see alembic/env.py)
+            command.stamp(config, "head")
+
+
+def prepare_schema(mode: str):
+    """Run by each worker at startup, see SCHEMA_STARTUP in config.py."""
+    logger.info("database %s", make_url(DATABASE_URL).render_as_string(hide_password=True))
+    if mode == "check":
+        logger.info("schema at %s", check_schema(get_engine(), SCHEMA_HEAD))
+    elif mode == "create":
+        create_schema(get_engine())
+    elif mode != "off":
+        raise ValueError(f"SCHEMA_STARTUP must be check, create or off, not {mode!r}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("check", "create", "upgrade", "head", "partitions"))
+    args = parser.parse_args(argv)
+
+    if args.command == "head":
+        print(head_revision())
+        return 0
+    if args.command == "upgrade":
+        from alembic import command
+
+        command.upgrade(alembic_config(), "head")
+        return 0
+    if args.command == "partitions":
+        with get_engine().begin() as conn:
+            names = progress.create_partitions(conn)
+        print(f"{len(names)} monthly partitions present" if names else "not PostgreSQL, nothing to do")
+        return 0
+    if args.command == "create":
+        create_schema(get_engine())
+        print(f"created schema at {head_revision()}")
+        return 0
+    try:
+        print(f"schema at {check_schema(get_engine())}")
+    except SchemaMismatch as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
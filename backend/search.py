@@ -0,0 +1,110 @@
+# search.py
+"""Full-text + fuzzy search over media names and tag names.
+
+Media.search_text holds "<name> <tag> <tag> ..." and is refreshed on flush
+whenever a media row's name or tags change. It is indexed per dialect:
+
+* PostgreSQL: GIN on to_tsvector('simple', search_text) for word matches
+  and GIN gin_trgm_ops (pg_trgm) for typo-tolerant word similarity.
+  pg_trgm is installed once per database, in public, so it has to stay on
+  the search_path of every schema that uses it.
+* SQLite: an external-content FTS5 table kept in sync by triggers, with
+  prefix matching and bm25 ranking (used by the test suite).
+"""
+import re
+from typing import List
+
+from sqlalchemy import DDL, column, event, func, inspect, literal, literal_column, or_, table
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+
+from models import Media
+
+
+def search_document(name: str, tag_names) -> str:
+    return " ".join([name, *tag_names])
+
+
+@event.listens_for(Session, "before_flush")
+def _refresh_search_text(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Media):
+            continue
+        state = inspect(obj)
+        if state.pending or state.attrs.name.history.has_changes() or state.attrs.tags.history.has_changes():
+            obj.search_text = search_document(obj.name, (tag.name for tag in obj.tags))
+
+
+# --- index DDL, also emitted by create_all/drop_all so tests get the same schema
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public",
+    "CREATE INDEX IF NOT EXISTS ix_media_search_tsv ON media USING gin (to_tsvector('simple', search_text))",
+    "CREATE INDEX IF NOT EXISTS ix_media_search_trgm ON media USING gin (search_text gin_trgm_ops)",
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS media_fts USING fts5(search_text, content='media', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS media_fts_ai AFTER INSERT ON media BEGIN
+        INSERT INTO media_fts(rowid, search_text) VALUES (new.id, new.search_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS media_fts_ad AFTER DELETE ON media BEGIN
+        INSERT INTO media_fts(media_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS media_fts_au AFTER UPDATE OF search_text ON media BEGIN
+        INSERT INTO media_fts(media_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+        INSERT INTO media_fts(rowid, search_text) VALUES (new.id, new.search_text);
+    END""",
+]
+
+for statement in POSTGRES_DDL:
+    event.listen(Media.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in SQLITE_DDL:
+    event.listen(Media.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Media.__table__, "before_drop", DDL("DROP TABLE IF EXISTS media_fts").execute_if(dialect="sqlite"))
+
+
+# --- queries
+
+media_fts = table("media_fts", column("rowid"))
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _fts5_query(q: str) -> str:
+    # every word must match as a prefix; quoting keeps FTS5 syntax out of user input
+    return " ".join(f'"{word}"*' for word in _WORD.findall(q))
+
+
+def search_statement(dialect_name: str, user_id: int, q: str, limit: int, offset: int):
+    """SELECT of Media rows ranked by relevance, best first; None if `q` has no words."""
+    if dialect_name == "postgresql":
+        document = func.to_tsvector(literal_column("'simple'"), Media.search_text)
+        query = func.websearch_to_tsquery(literal_column("'simple'"), q)
+        rank = func.ts_rank(document, query) + func.word_similarity(q, Media.search_text)
+        statement = (
+            select(Media)
+            .where(Media.user_id == user_id)
+            .where(or_(document.op("@@")(query), literal(q).op("<%")(Media.search_text)))
+            .order_by(rank.desc(), Media.id)
+        )
+    else:
+        match = _fts5_query(q)
+        if not match:
+            return None
+        fts = literal_column("media_fts")
+        statement = (
+            select(Media)
+            .join(media_fts, media_fts.c.rowid == Media.id)
+            .where(Media.user_id == user_id)
+            .where(fts.op("MATCH")(match))
+            .order_by(func.bm25(fts), Media.id)
+        )
+    return statement.options(selectinload(Media.tags)).limit(limit).offset(offset)
+
+
+def search_media(session: Session, user_id: int, q: str, limit: int = 20, offset: int = 0) -> List[Media]:
+    statement = search_statement(session.get_bind().dialect.name, user_id, q, limit, offset)
+    if statement is None:
+        return []
+    return session.exec(statement).all()
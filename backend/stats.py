@@ -0,0 +1,90 @@
+# stats.py
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlmodel import Session, SQLModel, select
+
+from config import STATS_CACHE_SIZE
+from lru import LRUCache
+from models import Media, MediaTagLink, Tag
+from versions import current_version
+
+TOP_TAGS = 10
+
+
+class TagCount(SQLModel):
+    name: str
+    count: int
+
+
+class MediaStats(SQLModel):
+    total: int = 0
+    by_category: Dict[str, int] = {}
+    by_status: Dict[str, int] = {}
+    ratings: Dict[int, int] = {}
+    average_progress: float = 0.0
+    top_tags: List[TagCount] = []
+
+
+class StatsCache(LRUCache):
+    """Per-user stats keyed by the user's media_version.
+
+    Every media write bumps media_version, so a cached entry is valid exactly
+    while its version matches the one on the user row. That check is the
+    same primary-key lookup the ETag uses, and works across workers.
+    """
+
+    def get(self, user_id: int, version: int) -> Optional[MediaStats]:
+        entry = super().get(user_id, valid=lambda entry: entry[0] == version)
+        return entry[1] if entry is not None else None
+
+    def put(self, user_id: int, version: int, stats: MediaStats) -> None:
+        super().put(user_id, (version, stats))
+
+
+stats_cache = StatsCache(maxsize=STATS_CACHE_SIZE)
+
+
+def compute_media_stats(session: Session, user_id: int) -> MediaStats:
+    stats = MediaStats(by_category={}, by_status={}, ratings={}, top_tags=[])
+    progress_sum = 0
+    grouped = session.exec(
+        select(Media.category, Media.status, func.count(), func.sum(Media.progress))
+        .where(Media.user_id == user_id)
+        .group_by(Media.category, Media.status)
+    ).all()
+    for category, status, count, progress in grouped:
+        stats.total += count
+        stats.by_category[category] = stats.by_category.get(category, 0) + count
+        stats.by_status[status] = stats.by_status.get(status, 0) + count
+        progress_sum += progress or 0
+    if stats.total:
+        stats.average_progress = progress_sum / stats.total
+
+    ratings = session.exec(
+        select(Media.rating, func.count()).where(Media.user_id == user_id).group_by(Media.rating)
+    ).all()
+    stats.ratings = {rating: count for rating, count in ratings}
+
+    count = func.count().label("count")
+    top = session.exec(
+        select(Tag.name, count)
+        .join(MediaTagLink, MediaTagLink.tag_id == Tag.id)
+        .join(Media, Media.id == MediaTagLink.media_id)
+        .where(Media.user_id == user_id)
+        .group_by(Tag.name)
+        .order_by(count.desc(), Tag.name)
+        .limit(TOP_TAGS)
+    ).all()
+    stats.top_tags = [TagCount(name=name, count=n) for name, n in top]
+    return stats
+
+
+def get_media_stats(session: Session, user_id: int) -> Tuple[MediaStats, int]:
+    """Return (stats, media_version), recomputing only after a media write."""
+    version, _ = current_version(session, user_id, "media")
+    stats = stats_cache.get(user_id, version)
+    if stats is None:
+        stats = compute_media_stats(session, user_id)
+        stats_cache.put(user_id, version, stats)
+    return stats, version
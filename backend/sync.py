@@ -0,0 +1,49 @@
+# sync.py
+from sqlalchemy import and_, union_all
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+
+from config import SYNC_PAGE_SIZE
+from models import Media, SyncDeleted, SyncRead, Task, Tombstone, User
+
+
+def _page_end(session: Session, window, since: int, upto: int, limit: int) -> int:
+    """Last change_seq of a page of about `limit` rows after `since`.
+
+    Rows written together share a change_seq, so a page ends on a whole
+    change_seq: the one before the (limit + 1)-th row's, or that row's own
+    when a single write alone holds more than `limit` rows.
+    """
+    seqs = union_all(*(select(model.change_seq).where(window(model)) for model in (Media, Task, Tombstone))).subquery()
+    head = session.exec(select(seqs.c.change_seq).order_by(seqs.c.change_seq).limit(limit + 1)).all()
+    if len(head) <= limit:
+        return upto
+    boundary = head[-1]
+    return boundary if head[0] == boundary else boundary - 1
+
+
+def changes_since(session: Session, user_id: int, since: int, limit: int = SYNC_PAGE_SIZE) -> SyncRead:
+    """Media/tasks upserted and deleted after change cursor `since`, a page at a time.
+
+    Each query is a range scan on a (user_id, change_seq) index, so the cost
+    follows the number of changes rather than the library size. Clients
+    apply `deleted` before the upserts, store `cursor` for the next call and
+    call again right away while `has_more` is set.
+    """
+    upto = session.exec(select(User.change_seq).where(User.id == user_id)).one()
+    result = SyncRead(cursor=upto)
+    if since >= upto:
+        return result
+
+    def window(model, end=upto):
+        return and_(model.user_id == user_id, model.change_seq > since, model.change_seq <= end)
+
+    end = _page_end(session, window, since, upto, limit)
+    result.cursor, result.has_more = end, end < upto
+    result.media = session.exec(select(Media).where(window(Media, end)).options(selectinload(Media.tags))).all()
+    result.tasks = session.exec(select(Task).where(window(Task, end))).all()
+    deleted = SyncDeleted()
+    for entity, entity_id in session.exec(select(Tombstone.entity, Tombstone.entity_id).where(window(Tombstone, end))):
+        (deleted.media if entity == "media" else deleted.tasks).append(entity_id)
+    result.deleted = deleted
+    return result
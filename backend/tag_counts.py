@@ -0,0 +1,106 @@
+# tag_counts.py
+"""Per-user tag usage counts behind /tags/ autocomplete and /tags/facets.
+
+Counts change only when media-tag links do. A before_flush hook turns
+pending link changes of Media objects (new rows, tag list changes,
+session.delete) into per-tag deltas and applies them with one upsert, so
+reads never COUNT(*) over mediataglink. Bulk DELETEs that bypass the ORM
+call release_media_tags() first.
+"""
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from sqlalchemy import DDL, and_, event, func, inspect
+from sqlmodel import Session, select
+
+from db import upsert
+from models import Media, MediaTagLink, Tag, TagUsage, UserTagCount
+
+def apply_deltas(session: Session, deltas: Dict[Tuple[int, int], int]) -> None:
+    rows = [{"user_id": u, "tag_id": t, "count": d} for (u, t), d in deltas.items() if d]
+    if not rows:
+        return
+    upsert(session, UserTagCount, rows, ["user_id", "tag_id"], lambda excluded: {
+        "count": UserTagCount.count + excluded.count,
+    })
+
+
+@event.listens_for(Session, "before_flush")
+def _track_tag_links(session, flush_context, instances):
+    deltas: Counter = Counter()
+    for obj in session.new:
+        if isinstance(obj, Media):
+            for tag in obj.tags:
+                deltas[(obj.user_id, tag.id)] += 1
+    for obj in session.dirty:
+        if isinstance(obj, Media):
+            history = inspect(obj).attrs.tags.history
+            for tag in history.added:
+                deltas[(obj.user_id, tag.id)] += 1
+            for tag in history.deleted:
+                deltas[(obj.user_id, tag.id)] -= 1
+    for obj in session.deleted:
+        if isinstance(obj, Media):
+            for tag in obj.tags:
+                deltas[(obj.user_id, tag.id)] -= 1
+    apply_deltas(session, deltas)
+
+
+def release_media_tags(session: Session, user_id: int, media_ids) -> None:
+    """Decrement counts for links about to be removed by a bulk DELETE."""
+    rows = session.exec(
+        select(MediaTagLink.tag_id, func.count())
+        .where(MediaTagLink.media_id.in_(media_ids))
+        .group_by(MediaTagLink.tag_id)
+    ).all()
+    apply_deltas(session, {(user_id, tag_id): -n for tag_id, n in rows})
+
+
+# prefix index for LIKE 'abc%' under any collation (btree text_pattern_ops)
+event.listen(
+    Tag.__table__,
+    "after_create",
+    DDL("CREATE INDEX IF NOT EXISTS ix_tag_name_pattern ON tag (name text_pattern_ops)").execute_if(dialect="postgresql"),
+)
+
+
+def _prefix_filter(dialect_name: str, prefix: str):
+    if dialect_name == "postgresql":
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return Tag.name.like(escaped + "%")
+    # SQLite's LIKE is case-insensitive and skips the index; a BINARY range uses ix_tag_name
+    return and_(Tag.name >= prefix, Tag.name < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+
+
+def autocomplete(session: Session, user_id: int, prefix: str, limit: int = 10) -> List[TagUsage]:
+    """Tags starting with `prefix`: the user's own first (most used first), then other existing tags."""
+    prefix = prefix.strip().lower()
+    if not prefix:
+        return []
+    matches = _prefix_filter(session.get_bind().dialect.name, prefix)
+    own = session.exec(
+        select(Tag.name, UserTagCount.count)
+        .join(UserTagCount, UserTagCount.tag_id == Tag.id)
+        .where(UserTagCount.user_id == user_id, UserTagCount.count > 0, matches)
+        .order_by(UserTagCount.count.desc(), Tag.name)
+        .limit(limit)
+    ).all()
+    results = [TagUsage(name=name, count=count) for name, count in own]
+    if len(results) < limit:
+        seen = [r.name for r in results]
+        others = session.exec(
+            select(Tag.name).where(matches, Tag.name.not_in(seen)).order_by(Tag.name).limit(limit - len(results))
+        ).all()
+        results += [TagUsage(name=name, count=0) for name in others]
+    return results
+
+
+def facets(session: Session, user_id: int, limit: int = 100) -> List[TagUsage]:
+    rows = session.exec(
+        select(Tag.name, UserTagCount.count)
+        .join(UserTagCount, UserTagCount.tag_id == Tag.id)
+        .where(UserTagCount.user_id == user_id, UserTagCount.count > 0)
+        .order_by(UserTagCount.count.desc(), Tag.name)
+        .limit(limit)
+    ).all()
+    return [TagUsage(name=name, count=count) for name, count in rows]
@@ -0,0 +1,114 @@
+# tags.py
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+from sqlmodel import Session, select
+
+from config import TAG_CACHE_SIZE, TAG_CACHE_TTL
+from db import upsert
+from lru import LRUCache
+from models import Tag
+
+class TagCache(LRUCache):
+    """Process-local LRU cache of normalized tag name -> tag id.
+
+    Tags are global and never renamed, so an id stays valid for as long as
+    the row exists. `ttl` (seconds) bounds staleness when several workers
+    write to the same database; None keeps entries until they are evicted.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: Optional[float] = None):
+        super().__init__(maxsize)
+        self.ttl = ttl
+
+    def put_many(self, items: Dict[str, int]) -> None:
+        super().put_many(items, self.clock() + self.ttl if self.ttl else None)
+
+    def invalidate(self, names: Iterable[str]) -> None:
+        for name in names:
+            self.pop(name)
+
+
+tag_cache = TagCache(maxsize=TAG_CACHE_SIZE, ttl=TAG_CACHE_TTL)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending_tags(session):
+    # ids of tags created in this transaction only become visible to the cache once committed
+    pending = session.info.pop("pending_tags", None)
+    session.info.pop("cached_tags", None)
+    if pending:
+        tag_cache.put_many(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending_tags(session):
+    session.info.pop("pending_tags", None)
+    # a failed write may have been caused by a stale cached id (e.g. FK violation)
+    cached = session.info.pop("cached_tags", None)
+    if cached:
+        tag_cache.invalidate(cached)
+
+
+def normalize_tag_names(names: Iterable[str]) -> List[str]:
+    """Strip + lowercase, drop empties and duplicates while keeping input order."""
+    seen = {}
+    for name in names:
+        normalized = name.strip().lower()
+        if normalized:
+            seen.setdefault(normalized, None)
+    return list(seen)
+
+
+def _select_tags(session: Session, names: List[str]) -> Dict[str, Tag]:
+    return {t.name: t for t in session.exec(select(Tag).where(Tag.name.in_(names))).all()}
+
+
+def _insert_tags(session: Session, names: List[str]) -> Dict[str, Tag]:
+    # ON CONFLICT DO NOTHING: names another writer just created come back from the final SELECT
+    rows = [{"name": name} for name in names]
+    return {t.name: t for t in upsert(session, Tag, rows, ["name"], returning=Tag).scalars()}
+
+
+def resolve_tags(session: Session, names: Iterable[str]) -> List[Tag]:
+    """Find or create tags for `names` without committing.
+
+    Names already in `tag_cache` cost no query at all. The rest are looked
+    up with one IN query and, only if some are missing, created with one
+    INSERT ... ON CONFLICT DO NOTHING RETURNING. Names that lose an insert
+    race to another writer are picked up by a final SELECT. The caller owns
+    the transaction.
+    """
+    wanted = normalize_tag_names(names)
+    if not wanted:
+        return []
+
+    found: Dict[str, Tag] = {}
+    cached = tag_cache.get_many(wanted)
+    for name, tag_id in cached.items():
+        # attach a persistent Tag without emitting a SELECT
+        tag = Tag(id=tag_id, name=name)
+        make_transient_to_detached(tag)
+        found[name] = session.merge(tag, load=False)
+    if cached:
+        session.info.setdefault("cached_tags", set()).update(cached)
+
+    uncached = [name for name in wanted if name not in found]
+    if uncached:
+        existing = _select_tags(session, uncached)
+        tag_cache.put_many({name: tag.id for name, tag in existing.items()})
+        found.update(existing)
+        missing = [name for name in uncached if name not in existing]
+        if missing:
+            created = _insert_tags(session, missing)
+            session.info.setdefault("pending_tags", {}).update({name: tag.id for name, tag in created.items()})
+            found.update(created)
+            raced = [name for name in missing if name not in created]
+            if raced:
+                tag_cache.invalidate(raced)
+                committed = _select_tags(session, raced)
+                tag_cache.put_many({name: tag.id for name, tag in committed.items()})
+                found.update(committed)
+
+    return [found[name] for name in wanted]
@@ -0,0 +1,148 @@
+# conftest.py
+"""Test database: one per pytest-xdist worker, one rolled-back transaction per test.
+
+By default each worker runs on its own in-memory SQLite database; with
+TEST_DATABASE_URL pointing at PostgreSQL each worker gets its own schema,
+searched before public, where pg_trgm is installed once for all of them
+(an extension belongs to the database, not to one worker's schema).
+Tables are created once per worker. Every test then runs inside a
+transaction on a single connection, handed to the app by overriding the
+get_engine dependency; the app's sessions join it with SAVEPOINTs (see
+db.new_session), and the transaction is rolled back when the test ends.
+
+With DATABASE_ASYNC=true the async routes use their own engine, which cannot
+share that connection, so each worker gets a SQLite file instead and tests
+keep what they commit (they use distinct usernames).
+"""
+import os
+import tempfile
+
+from sqlalchemy.engine import make_url
+
+WORKER = os.getenv("PYTEST_XDIST_WORKER", "main")
+ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() in ("1", "true", "yes")
+
+# must happen before config/auth are imported by the test modules
+os.environ.setdefault("BCRYPT_ROUNDS", "5")
+if ASYNC:
+    os.environ.setdefault("TEST_DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test-{WORKER}.db")
+os.environ.setdefault("TEST_DATABASE_URL", "sqlite://")
+
+SCHEMA = None
+_url = make_url(os.environ["TEST_DATABASE_URL"])
+if _url.get_backend_name() == "postgresql" and not ASYNC:
+    SCHEMA = f"test_{WORKER}"
+    os.environ["TEST_DATABASE_URL"] = _url.update_query_dict(
+        {"options": f"-csearch_path={SCHEMA},public"}
+    ).render_as_string(hide_password=False)
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine, event, text  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+
+import db  # noqa: E402
+from async_db import get_async_engine  # noqa: E402
+from auth import user_cache  # noqa: E402
+from db import get_engine, new_session  # noqa: E402
+from main import app  # noqa: E402
+from replicas import get_read_router  # noqa: E402
+from stats import stats_cache  # noqa: E402
+from tags import tag_cache  # noqa: E402
+
+
+def _sqlite_savepoints(engine):
+    # pysqlite's own transaction handling breaks SAVEPOINT; issue BEGIN ourselves
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
+def _clear_caches():
+    # process-wide caches would otherwise remember rows a rollback removed
+    for cache in (user_cache, tag_cache, stats_cache, get_read_router().writers):
+        cache.clear()
+
+
+@pytest.fixture(scope="session")
+def engine():
+    engine = get_engine()
+    if SCHEMA is not None:
+        with create_engine(_url).begin() as conn:
+            # workers start together; IF NOT EXISTS alone still races on pg_extension
+            conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('pg_trgm'))"))
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public"))
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    elif engine.dialect.name == "sqlite" and not ASYNC:
+        _sqlite_savepoints(engine)
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    if SCHEMA is not None:
+        engine.dispose()
+        with create_engine(_url).begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+@pytest.fixture(autouse=True)
+def connection(request, engine):
+    """The test's connection, also what the app's get_engine dependency returns."""
+    if ASYNC or "private_engine" in request.fixturenames:
+        yield engine
+        _clear_caches()
+        return
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        app.dependency_overrides[get_engine] = lambda: connection
+        try:
+            yield connection
+        finally:
+            app.dependency_overrides.pop(get_engine, None)
+            transaction.rollback()
+            _clear_caches()
+
+
+@pytest.fixture
+def session(connection):
+    """Session inside the test's transaction, for seeding and checking rows directly."""
+    with new_session(connection) as session:
+        yield session
+
+
+@pytest.fixture
+def route_engine(engine):
+    """The Engine the routes' statements run on, for event listeners: with
+    DATABASE_ASYNC that is the async engine's sync_engine."""
+    return get_async_engine().sync_engine if ASYNC else engine
+
+
+@pytest.fixture
+def auth_headers():
+    """auth_headers(username) registers and logs in a user, returning their Authorization header."""
+    client = TestClient(app)
+
+    def login(username: str) -> dict:
+        client.post("/register", params={"username": username, "password": "pw"})
+        token = client.post("/login", params={"username": username, "password": "pw"}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    return login
+
+
+@pytest.fixture
+def private_engine(monkeypatch, tmp_path, engine):
+    """A fresh SQLite file behind an engine built like the app's own (real pool,
+    real commits), for pool tests and code that opens its own sessions."""
+    if ASYNC:
+        yield engine
+        return
+    monkeypatch.setattr(db, "DATABASE_URL", f"sqlite:///{tmp_path / 'private.db'}")
+    engine = db._create_engine()
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(db, "_engine", engine)
+    yield engine
+    engine.dispose()
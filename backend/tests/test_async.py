@@ -0,0 +1,92 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+
+from async_db import get_async_engine
+from async_routes import install_async_routes, router
+from auth import create_access_token
+from models import User
+
+app = FastAPI()
+app.include_router(router)
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    # aiosqlite cannot join the sync test connection; use a file both engines can open
+    path = tmp_path_factory.mktemp("async") / "async.db"
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(username="asyncuser", hashed_password="x")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        user_id = user.id
+    token = create_access_token({"sub": "asyncuser", "uid": user_id})
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    app.dependency_overrides[get_async_engine] = lambda: async_engine
+    with TestClient(app, headers={"Authorization": f"Bearer {token}"}) as client:
+        yield client
+    app.dependency_overrides.clear()
+    engine.dispose()
+
+
+def test_async_task_crud(client):
+    created = client.post("/tasks/", json={"title": "Async Task"}).json()
+    assert created["title"] == "Async Task"
+    updated = client.put(f"/tasks/{created['id']}", json={"title": "Renamed"}).json()
+    assert updated["title"] == "Renamed"
+    assert [t["title"] for t in client.get("/tasks/").json()] == ["Renamed"]
+    assert client.delete(f"/tasks/{created['id']}").json() == {"ok": True}
+    assert client.get("/tasks/").json() == []
+
+
+def test_async_media_crud(client):
+    created = client.post(
+        "/media/",
+        json={"name": "Async Show", "category": "anime", "status": "in progress", "progress": 1,
+              "tags": [{"name": "Async"}]},
+    ).json()
+    assert [t["name"] for t in created["tags"]] == ["async"]
+
+    updated = client.put(
+        f"/media/{created['id']}",
+        json={"name": "Async Show", "category": "anime", "status": "completed", "progress": 12,
+              "tags": [{"name": "async"}, {"name": "done"}]},
+    ).json()
+    assert updated["progress"] == 12
+    assert sorted(t["name"] for t in updated["tags"]) == ["async", "done"]
+
+    listed = client.get("/media/", params={"status": "completed"}).json()
+    assert [m["id"] for m in listed] == [created["id"]]
+    assert client.delete(f"/media/{created['id']}").json() == {"ok": True}
+    assert client.get("/media/").json() == []
+
+
+def test_install_async_routes_replaces_in_place():
+    target = FastAPI()
+
+    @target.get("/tasks/")
+    def sync_tasks():
+        return []
+
+    @target.get("/other")
+    def other():
+        return {}
+
+    install_async_routes(target)
+    endpoints = [route.endpoint.__name__ for route in target.router.routes if hasattr(route, "methods")]
+    assert endpoints[-2:] == ["get_tasks", "other"]
+
+
+def test_every_data_route_has_an_async_counterpart():
+    import main
+
+    def routes(routes, sections=("me", "sync", "tasks", "media", "tags")):
+        return {(r.path, m) for r in routes if isinstance(r, APIRoute) and r.path.split("/")[1] in sections for m in r.methods}
+
+    assert routes(main.app.router.routes) == routes(router.routes)
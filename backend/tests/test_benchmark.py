@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+from benchmark import main, parse_mix, percentile, use_database_url
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([7.0], 95) == 7.0
+    assert percentile([], 50) is None
+
+
+def test_parse_mix_rejects_unknown_operations():
+    assert parse_mix("list=3,create=1") == {"list": 3, "create": 1}
+    try:
+        parse_mix("list=1,explode=2")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_database_url_flag_beats_the_environment(monkeypatch):
+    monkeypatch.setenv("TEST_DATABASE_URL", "sqlite:///from-env.db")
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///from-env.db")
+    use_database_url("sqlite:///from-flag.db")
+    # config resolves the URL at import: ask a fresh interpreter
+    resolved = subprocess.run(
+        [sys.executable, "-c", "import config; print(config.DATABASE_URL)"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=dict(os.environ), capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    assert resolved == "sqlite:///from-flag.db"
+
+
+def test_benchmark_smoke(tmp_path, private_engine):
+    output = tmp_path / "run.json"
+    result = main([
+        "--users", "2", "--media", "5", "--tags", "3", "--requests", "20", "--warmup", "0",
+        "--concurrency", "1", "--mix", "list=2,create=1,update=1,delete=1", "--output", str(output),
+    ])
+    assert output.exists()
+    assert result["overall"]["requests"] == 20
+    assert result["overall"]["errors"] == 0
+    assert result["ops"]["list"]["sql_per_request"] >= 1
+
+
+def test_serialization_paths_are_byte_identical(private_engine):
+    result = main(["--serialization", "--media", "30", "--tags", "4", "--requests", "2"])
+    assert result["identical"]
@@ -0,0 +1,77 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from events import Broker, broker, event_stream
+from main import app
+
+client = TestClient(app)
+
+
+def test_commits_publish_compact_changes_and_rollbacks_none(auth_headers):
+    headers = auth_headers("eventuser")
+    user_id = client.get("/me", headers=headers).json()["id"]
+    media = {"name": "Frieren", "category": "anime", "status": "in progress", "progress": 1}
+
+    async def scenario():
+        subscription = broker.subscribe(user_id)
+        try:
+            created = (await asyncio.to_thread(client.post, "/media/", json=media, headers=headers)).json()
+            first = await subscription.get(1)
+            # a failed write (stale If-Match) is rolled back and publishes nothing
+            stale = await asyncio.to_thread(
+                client.patch, f"/media/{created['id']}", json={"progress": 2}, headers={**headers, "If-Match": '"media-0-0"'}
+            )
+            assert stale.status_code == 412
+            await asyncio.to_thread(client.patch, f"/media/{created['id']}", json={"progress": 3}, headers=headers)
+            second = await subscription.get(1)
+            await asyncio.to_thread(client.delete, f"/media/{created['id']}", headers=headers)
+            third = await subscription.get(1)
+            return created, first, second, third
+        finally:
+            broker.unsubscribe(subscription)
+
+    created, first, second, third = asyncio.run(scenario())
+    assert first == [{"entity": "media", "id": created["id"], "op": "create", "version": created["change_seq"]}]
+    assert [(e["op"], e["id"]) for e in second] == [("update", created["id"])]
+    assert second[0]["version"] > first[0]["version"]
+    assert [(e["op"], e["id"]) for e in third] == [("delete", created["id"])]
+    assert broker.stats()["subscribers"] == 0
+
+
+def test_slow_subscriber_is_dropped_not_buffered():
+    small = Broker(queue_size=2)
+
+    async def scenario():
+        subscription = small.subscribe(1)
+        for version in range(5):
+            small.publish(1, [{"entity": "task", "id": 1, "op": "update", "version": version}])
+        await asyncio.sleep(0)  # let the loop run the queued offers
+        return subscription, await subscription.get(1)
+
+    subscription, batch = asyncio.run(scenario())
+    assert batch is None and subscription.dropped
+    assert small.stats()["dropped"] == 1
+
+
+def test_event_stream_format_heartbeat_and_resync():
+    async def scenario():
+        stream = event_stream(7, last_event_id=10, current_cursor=lambda: 12, heartbeat=0.01)
+        chunks = [await stream.__anext__() for _ in range(3)]  # retry, resync, ping
+        broker.publish(7, [{"entity": "task", "id": 3, "op": "update", "version": 13}])
+        while (chunk := await stream.__anext__()) == ": ping\n\n":
+            pass
+        await stream.aclose()
+        return chunks + [chunk]
+
+    chunks = asyncio.run(scenario())
+    assert chunks[0].startswith("retry:")
+    assert chunks[1] == 'id: 12\nevent: resync\ndata: {"since":10,"cursor":12}\n\n'
+    assert chunks[2] == ": ping\n\n"
+    assert chunks[3] == 'id: 13\nevent: change\ndata: {"entity":"task","id":3,"op":"update","version":13}\n\n'
+    assert broker.stats()["subscribers"] == 0
+
+
+def test_events_requires_a_token():
+    assert client.get("/events").status_code == 401
+    assert client.get("/events", params={"access_token": "garbage"}).status_code == 401
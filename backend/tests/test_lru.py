@@ -0,0 +1,27 @@
+from lru import LRUCache
+
+
+def test_lru_evicts_least_recently_used_and_expires():
+    now = [100.0]
+    cache = LRUCache(maxsize=2, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2, expires=105.0)
+    assert cache.get("a") == 1  # a is now the most recent
+    cache.put("c", 3)
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "c": 3}
+
+    cache.put("d", 4, expires=101.0)
+    now[0] = 101.0
+    assert cache.get("d") is None and cache.stats()["size"] == 1  # expired entries are dropped
+
+    cache.put("e", 5)
+    assert cache.get("c", valid=lambda value: value > 3) is None  # rejected, but kept
+    cache.pop_where(lambda key, value: value == 5)
+    assert cache.get_many(["c", "e"]) == {"c": 3}
+    assert (cache.hits, cache.misses) == (4, 4)
+
+
+def test_lru_with_no_room_caches_nothing():
+    cache = LRUCache(maxsize=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
@@ -0,0 +1,69 @@
+import random
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import ordering
+from main import app
+from ordering import key_between
+
+client = TestClient(app)
+
+
+def test_key_between_orders_keys():
+    keys = [key_between(None, None)]
+    for _ in range(200):
+        keys.append(key_between(keys[-1], None))
+    for _ in range(200):
+        keys.insert(0, key_between(None, keys[0]))
+    assert keys == sorted(keys) and len(set(keys)) == len(keys)
+    assert max(len(k) for k in keys) <= 3  # appends grow the integer part, not the fraction
+
+    rng = random.Random(7)
+    for _ in range(500):
+        i = rng.randrange(len(keys) - 1)
+        keys.insert(i + 1, key_between(keys[i], keys[i + 1]))
+    assert keys == sorted(keys) and len(set(keys)) == len(keys)
+
+
+def test_move_task_writes_one_row(route_engine, auth_headers):
+    headers = auth_headers("orderuser")
+    ids = [client.post("/tasks/", json={"title": t}, headers=headers).json()["id"] for t in "abcd"]
+    titles = lambda: [t["title"] for t in client.get("/tasks/", params={"sort": "rank"}, headers=headers).json()]
+    assert titles() == ["a", "b", "c", "d"]
+
+    updates = []
+
+    def track(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE task"):
+            updates.append(statement)
+
+    event.listen(route_engine, "before_cursor_execute", track)
+    try:
+        response = client.patch(f"/tasks/{ids[3]}/move", json={"after_id": ids[0]}, headers=headers)
+    finally:
+        event.remove(route_engine, "before_cursor_execute", track)
+    assert response.status_code == 200
+    assert len(updates) == 1
+    assert titles() == ["a", "d", "b", "c"]
+
+    client.patch(f"/tasks/{ids[2]}/move", json={"after_id": None}, headers=headers)
+    assert titles() == ["c", "a", "d", "b"]
+    assert client.patch(f"/tasks/{ids[2]}/move", json={"after_id": ids[2]}, headers=headers).status_code == 400
+    assert client.patch(f"/tasks/{ids[2]}/move", json={"after_id": 10**9}, headers=headers).status_code == 404
+
+
+def test_move_media_and_rebalance(monkeypatch, auth_headers):
+    headers = auth_headers("ordermedia")
+    media = {"category": "book", "status": "planned", "progress": 0, "rating": 0, "tags": []}
+    ids = [client.post("/media/", json={**media, "name": n}, headers=headers).json()["id"] for n in "xyz"]
+    names = lambda: [m["name"] for m in client.get("/media/", params={"sort": "rank"}, headers=headers).json()]
+
+    # keep dropping z between x and y: the gap narrows and keys grow
+    monkeypatch.setattr(ordering, "RANK_REBALANCE_LENGTH", 6)
+    for _ in range(20):
+        client.patch(f"/media/{ids[2]}/move", json={"after_id": ids[0]}, headers=headers)
+        client.patch(f"/media/{ids[1]}/move", json={"after_id": ids[0]}, headers=headers)
+    assert names() == ["x", "y", "z"]
+    ranks = [m["rank"] for m in client.get("/media/", params={"sort": "rank"}, headers=headers).json()]
+    assert max(len(r) for r in ranks) <= 6  # rebalanced in the background
@@ -0,0 +1,86 @@
+from datetime import date, datetime
+
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from main import app
+from models import MediaActivityDay, MediaActivityWeek, MediaProgressEvent
+from progress import ProgressChange, record_progress, week_start
+
+client = TestClient(app)
+
+
+def media(name, progress, category="book"):
+    return {"name": name, "category": category, "status": "in progress", "progress": progress, "tags": []}
+
+
+def test_every_update_path_logs_progress_and_rolls_it_up(session, auth_headers):
+    headers = auth_headers("progressuser")
+    book = client.post("/media/", json=media("Dune", 10), headers=headers).json()
+    show = client.post("/media/", json=media("Frieren", 0, "anime"), headers=headers).json()
+
+    client.put(f"/media/{book['id']}", json=media("Dune", 40), headers=headers)
+    client.put(f"/media/{book['id']}", json={**media("Dune", 40), "status": "paused"}, headers=headers)  # no progress change
+    client.patch(f"/media/{book['id']}", json={"progress": 35}, headers=headers)
+    client.patch(f"/media/{show['id']}", json={"rating": 8}, headers=headers)
+    client.post("/media/batch", json=[{"op": "update", "id": show["id"], "data": media("Frieren", 3, "anime")}], headers=headers)
+
+    user_id = book["user_id"]
+    events = session.exec(
+        select(MediaProgressEvent).where(MediaProgressEvent.user_id == user_id).order_by(MediaProgressEvent.ts)
+    ).all()
+    assert [(e.media_id, e.progress_from, e.progress_to) for e in events] == [
+        (book["id"], 10, 40), (book["id"], 40, 35), (show["id"], 0, 3),
+    ]
+
+    today = datetime.utcnow().date()
+    response = client.get("/media/activity", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == [
+        {"start": today.isoformat(), "category": "anime", "events": 1, "progress": 3},
+        {"start": today.isoformat(), "category": "book", "events": 2, "progress": 25},
+    ]
+    weekly = client.get("/media/activity", params={"bucket": "week", "category": "book"}, headers=headers).json()
+    assert weekly == [{"start": week_start(today).isoformat(), "category": "book", "events": 2, "progress": 25}]
+
+    # history outlives the item
+    client.delete(f"/media/{book['id']}", headers=headers)
+    assert len(client.get("/media/activity", headers=headers).json()) == 2
+
+
+def test_rollups_bucket_by_utc_day_and_monday(session, auth_headers):
+    user_id = client.get("/me", headers=auth_headers("bucketuser")).json()["id"]
+    changes = [ProgressChange(user_id, 1, "manga", 0, 5), ProgressChange(user_id, 2, "manga", 7, 9)]
+    record_progress(session, changes, ts=datetime(2026, 10, 14, 23, 59))  # a Wednesday
+    record_progress(session, [ProgressChange(user_id, 1, "manga", 5, 4)], ts=datetime(2026, 10, 18, 8, 0))
+    record_progress(session, [ProgressChange(user_id, 1, "manga", 4, 4)], ts=datetime(2026, 10, 18, 9, 0))  # not a change
+
+    days = session.exec(select(MediaActivityDay.day, MediaActivityDay.events, MediaActivityDay.progress)
+                        .where(MediaActivityDay.user_id == user_id).order_by(MediaActivityDay.day)).all()
+    assert days == [(date(2026, 10, 14), 2, 7), (date(2026, 10, 18), 1, -1)]
+    weeks = session.exec(select(MediaActivityWeek.week, MediaActivityWeek.events, MediaActivityWeek.progress)
+                         .where(MediaActivityWeek.user_id == user_id)).all()
+    assert weeks == [(date(2026, 10, 12), 3, 6)]
+
+
+def test_changes_within_one_clock_tick_extend_the_event(session, auth_headers):
+    user_id = client.get("/me", headers=auth_headers("tickuser")).json()["id"]
+    ts = datetime(2026, 10, 14, 12, 0)
+    record_progress(session, [ProgressChange(user_id, 1, "book", 0, 5), ProgressChange(user_id, 1, "book", 5, 7)], ts=ts)
+    record_progress(session, [ProgressChange(user_id, 1, "book", 7, 6)], ts=ts)
+
+    events = session.exec(select(MediaProgressEvent.progress_from, MediaProgressEvent.progress_to)
+                          .where(MediaProgressEvent.user_id == user_id)).all()
+    assert events == [(0, 6)]
+    day = session.exec(select(MediaActivityDay.events, MediaActivityDay.progress)
+                       .where(MediaActivityDay.user_id == user_id)).one()
+    assert day == (3, 6)
+
+
+def test_activity_range_is_bounded(auth_headers):
+    headers = auth_headers("rangeuser")
+    too_long = client.get("/media/activity", params={"start": "2020-01-01", "end": "2026-01-01"}, headers=headers)
+    assert too_long.status_code == 400
+    backwards = client.get("/media/activity", params={"start": "2026-02-01", "end": "2026-01-01"}, headers=headers)
+    assert backwards.status_code == 400
+    assert client.get("/media/activity", params={"bucket": "week", "start": "2022-01-01"}, headers=headers).status_code == 200
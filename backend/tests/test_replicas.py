@@ -0,0 +1,75 @@
+import time
+
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, Session, create_engine
+
+import replicas
+from config import DATABASE_ASYNC
+from main import app
+from models import User
+from replicas import LAST_WRITE_HEADER, ReadRouter
+
+client = TestClient(app)
+
+
+def test_reads_go_to_replica_except_right_after_a_write(tmp_path, monkeypatch, engine, auth_headers):
+    replica_engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    SQLModel.metadata.create_all(replica_engine)
+    router = ReadRouter(engine, [replica_engine], window=60, health_interval=60)
+    monkeypatch.setattr(replicas, "_read_router", router)
+
+    headers = auth_headers("replicauser")
+    user_id = client.get("/me", headers=headers).json()["id"]
+    # the replica has caught up on the user but lags behind on tasks
+    with Session(replica_engine) as session:
+        session.add(User(id=user_id, username="replicauser", hashed_password="x"))
+        session.commit()
+
+    client.post("/tasks/", json={"title": "Fresh"}, headers=headers)
+    # read-your-writes: still on the primary
+    assert [t["title"] for t in client.get("/tasks/", headers=headers).json()] == ["Fresh"]
+
+    router.writers.clear()
+    if DATABASE_ASYNC:
+        # async routes always read from the primary's async engine (see async_routes.py)
+        assert [t["title"] for t in client.get("/tasks/", headers=headers).json()] == ["Fresh"]
+        return
+    assert client.get("/tasks/", headers=headers).json() == []  # served by the lagging replica
+
+    # an unhealthy replica is skipped until a health probe succeeds
+    router.replicas[0].mark_down()
+    assert [t["title"] for t in client.get("/tasks/", headers=headers).json()] == ["Fresh"]
+    router.replicas[0].next_check = 0
+    assert client.get("/tasks/", headers=headers).json() == []
+    assert router.replicas[0].healthy
+
+
+def test_replica_failing_health_probe_stays_out_of_rotation(tmp_path, engine):
+    broken = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    router = ReadRouter(engine, [broken], window=60, health_interval=60)
+    router.replicas[0].healthy = False
+    assert router.engine_for(1) is engine
+    assert not router.replicas[0].healthy and router.replicas[0].next_check > 0
+
+
+def test_write_window_carries_across_processes(tmp_path, monkeypatch, engine, auth_headers):
+    # two workers: each has its own router and in-process window
+    replica_engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    writer = ReadRouter(engine, [replica_engine], window=60, health_interval=60)
+    reader = ReadRouter(engine, [replica_engine], window=60, health_interval=60)
+    monkeypatch.setattr(replicas, "_read_router", writer)
+
+    headers = auth_headers("lastwriteuser")
+    user_id = client.get("/me", headers=headers).json()["id"]
+    assert LAST_WRITE_HEADER not in client.get("/tasks/", headers=headers).headers
+
+    response = client.post("/tasks/", json={"title": "Fresh"}, headers=headers)
+    last_write = response.headers[LAST_WRITE_HEADER]
+    assert writer.engine_for(user_id) is engine
+    # the other worker never saw the write, only the header the client echoes
+    assert reader.engine_for(user_id) is replica_engine
+    assert reader.engine_for(user_id, last_write=last_write) is engine
+
+    assert reader.engine_for(user_id, last_write=str(time.time() - 61)) is replica_engine  # window over
+    assert reader.engine_for(user_id, last_write=str(time.time() + 3600)) is replica_engine  # forged
+    assert reader.engine_for(user_id, last_write="soon") is replica_engine
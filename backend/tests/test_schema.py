@@ -0,0 +1,54 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlmodel import SQLModel, create_engine
+
+import db
+import main
+from main import app
+from schema import SchemaMismatch, check_schema, head_revision
+
+
+def test_check_schema_compares_alembic_version_with_head(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    with pytest.raises(SchemaMismatch, match="no revision"):
+        check_schema(engine)
+
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+        conn.execute(text("INSERT INTO alembic_version VALUES ('0000outdated')"))
+    with pytest.raises(SchemaMismatch, match="0000outdated"):
+        check_schema(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE alembic_version SET version_num = :head"), {"head": head_revision()})
+    assert check_schema(engine) == head_revision()
+
+
+def test_startup_fails_fast_on_unmigrated_database(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    monkeypatch.setattr(db, "_engine", engine)
+    monkeypatch.setattr(main, "SCHEMA_STARTUP", "check")
+    with pytest.raises(SchemaMismatch):
+        with TestClient(app):
+            pass
+    # nothing was created behind Alembic's back
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM sqlite_master WHERE type = 'table'")).scalar() == 0
+
+
+def test_time_to_first_request_is_reported():
+    client = TestClient(app)
+    client.get("/")
+    assert "process_first_request_seconds" in client.get("/metrics").text
+
+
+def test_create_mode_stamps_head(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    monkeypatch.setattr(db, "_engine", engine)
+    monkeypatch.setattr(main, "SCHEMA_STARTUP", "create")
+    with TestClient(app):
+        pass
+    # so a later `schema.py check` (or SCHEMA_STARTUP=check) accepts it
+    assert check_schema(engine) == head_revision()
@@ -0,0 +1,70 @@
+from fastapi.testclient import TestClient
+
+from main import app
+
+client = TestClient(app)
+
+
+def test_sync_returns_only_changes_since_cursor(auth_headers):
+    headers = auth_headers("syncuser")
+    item = {"category": "book", "status": "in progress", "progress": 0}
+
+    initial = client.get("/sync", headers=headers).json()
+    assert initial["media"] == [] and initial["tasks"] == []
+
+    keep = client.post("/media/", json={**item, "name": "Keep"}, headers=headers).json()
+    gone = client.post("/media/", json={**item, "name": "Gone"}, headers=headers).json()
+    task = client.post("/tasks/", json={"title": "Sync Task"}, headers=headers).json()
+
+    first = client.get("/sync", params={"since": initial["cursor"]}, headers=headers).json()
+    assert sorted(m["name"] for m in first["media"]) == ["Gone", "Keep"]
+    assert [t["title"] for t in first["tasks"]] == ["Sync Task"]
+
+    client.put(f"/media/{keep['id']}", json={**item, "name": "Kept", "tags": [{"name": "x"}]}, headers=headers)
+    client.delete(f"/media/{gone['id']}", headers=headers)
+    client.delete(f"/tasks/{task['id']}", headers=headers)
+
+    second = client.get("/sync", params={"since": first["cursor"]}, headers=headers).json()
+    assert [(m["name"], [t["name"] for t in m["tags"]]) for m in second["media"]] == [("Kept", ["x"])]
+    assert second["tasks"] == []
+    assert second["deleted"] == {"media": [gone["id"]], "tasks": [task["id"]]}
+
+    idle = client.get("/sync", params={"since": second["cursor"]}, headers=headers).json()
+    assert idle == {"cursor": second["cursor"], "has_more": False, "media": [], "tasks": [], "deleted": {"media": [], "tasks": []}}
+
+    assert client.get("/sync", params={"since": second["cursor"] + 10}, headers=headers).status_code == 410
+
+
+def test_sync_tracks_batch_changes(auth_headers):
+    headers = auth_headers("syncbatch")
+    start = client.get("/sync", headers=headers).json()["cursor"]
+    results = client.post(
+        "/media/batch",
+        json=[{"op": "create", "data": {"name": n, "category": "anime", "status": "completed", "progress": 1}} for n in "ab"],
+        headers=headers,
+    ).json()
+    client.post("/media/batch", json=[{"op": "delete", "id": results[0]["id"]}], headers=headers)
+
+    changes = client.get("/sync", params={"since": start}, headers=headers).json()
+    assert [m["name"] for m in changes["media"]] == ["b"]
+    assert changes["deleted"]["media"] == [results[0]["id"]]
+
+
+def test_sync_pages_on_whole_writes(auth_headers):
+    headers = auth_headers("syncpages")
+    item = {"category": "book", "status": "in progress", "progress": 0}
+    for name in "abc":
+        client.post("/media/", json={**item, "name": name}, headers=headers)
+    # one write, three rows sharing a change_seq
+    client.post("/media/batch", json=[{"op": "create", "data": {**item, "name": n}} for n in "def"], headers=headers)
+    client.post("/tasks/", json={"title": "t"}, headers=headers)
+
+    pages, since = [], 0
+    while True:
+        page = client.get("/sync", params={"since": since, "limit": 2}, headers=headers).json()
+        pages.append(sorted(m["name"] for m in page["media"]) + [t["title"] for t in page["tasks"]])
+        since = page["cursor"]
+        if not page["has_more"]:
+            break
+    # the batch is never split, even though it is bigger than a page
+    assert pages == [["a", "b"], ["c"], ["d", "e", "f"], ["t"]]
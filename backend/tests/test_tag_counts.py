@@ -0,0 +1,42 @@
+from fastapi.testclient import TestClient
+
+from main import app
+
+client = TestClient(app)
+
+
+def media(name, tags):
+    return {"name": name, "category": "book", "status": "in progress", "progress": 0, "tags": [{"name": t} for t in tags]}
+
+
+def test_facets_follow_media_writes(auth_headers):
+    headers = auth_headers("facetuser")
+    a = client.post("/media/", json=media("A", ["fantasy", "epic"]), headers=headers).json()
+    b = client.post("/media/", json=media("B", ["fantasy"]), headers=headers).json()
+    facets = lambda: client.get("/tags/facets", headers=headers).json()
+    assert facets() == [{"name": "fantasy", "count": 2}, {"name": "epic", "count": 1}]
+
+    client.put(f"/media/{a['id']}", json=media("A", ["epic", "grimdark"]), headers=headers)
+    assert facets() == [{"name": "epic", "count": 1}, {"name": "fantasy", "count": 1}, {"name": "grimdark", "count": 1}]
+
+    client.delete(f"/media/{b['id']}", headers=headers)
+    client.post("/media/batch", json=[{"op": "delete", "id": a["id"]}], headers=headers)
+    assert facets() == []
+
+
+def test_autocomplete_ranks_own_tags_by_usage(auth_headers):
+    other = auth_headers("facetother")
+    client.post("/media/", json=media("X", ["qx-fable"]), headers=other)
+
+    headers = auth_headers("completeuser")
+    client.post("/media/", json=media("A", ["qx-fantasy", "qx-farce"]), headers=headers)
+    client.post("/media/", json=media("B", ["qx-farce"]), headers=headers)
+
+    response = client.get("/tags/", params={"prefix": "QX-FA"}, headers=headers)
+    assert response.json() == [
+        {"name": "qx-farce", "count": 2},
+        {"name": "qx-fantasy", "count": 1},
+        {"name": "qx-fable", "count": 0},
+    ]
+    assert client.get("/tags/", params={"prefix": "qx-fan", "limit": 1}, headers=headers).json() == [{"name": "qx-fantasy", "count": 1}]
+    assert client.get("/tags/", params={"prefix": "zzz"}, headers=headers).json() == []
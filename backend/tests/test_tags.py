@@ -0,0 +1,105 @@
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from models import Tag
+from tags import TagCache, normalize_tag_names, resolve_tags, tag_cache
+
+engine = create_engine("sqlite://")
+
+
+def setup_module(module):
+    SQLModel.metadata.create_all(engine)
+
+
+def setup_function(function):
+    tag_cache.clear()
+
+
+def teardown_module(module):
+    # the cache is process-wide; don't leak ids from this in-memory database
+    tag_cache.clear()
+
+
+def count_statements(fn):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        result = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return result, statements
+
+
+def test_normalize_tag_names():
+    assert normalize_tag_names([" Fantasy", "fantasy", "", "  ", "Sci-Fi"]) == ["fantasy", "sci-fi"]
+
+
+def test_resolve_tags_bulk():
+    with Session(engine) as session:
+        session.add(Tag(name="existing"))
+        session.commit()
+
+        tags, statements = count_statements(lambda: resolve_tags(session, ["Existing", "new-a", "NEW-A", "new-b"]))
+
+        assert [t.name for t in tags] == ["existing", "new-a", "new-b"]
+        assert all(t.id is not None for t in tags)
+        # one SELECT ... IN plus one INSERT ... ON CONFLICT DO NOTHING RETURNING
+        assert len(statements) == 2
+        session.commit()
+
+    with Session(engine) as session:
+        names = session.exec(select(Tag.name)).all()
+        assert sorted(names) == ["existing", "new-a", "new-b"]
+
+
+def test_resolve_tags_rolls_back_with_caller():
+    with Session(engine) as session:
+        resolve_tags(session, ["uncommitted"])
+        session.rollback()
+    with Session(engine) as session:
+        assert session.exec(select(Tag).where(Tag.name == "uncommitted")).first() is None
+
+
+def test_resolve_tags_uses_cache_after_commit():
+    with Session(engine) as session:
+        resolve_tags(session, ["cached-a", "cached-b"])
+        # created tags are not cached before the transaction commits
+        assert tag_cache.get_many(["cached-a"]) == {}
+        session.commit()
+
+    with Session(engine) as session:
+        tags, statements = count_statements(lambda: resolve_tags(session, ["cached-a", "Cached-B"]))
+        assert statements == []
+        assert [t.name for t in tags] == ["cached-a", "cached-b"]
+    assert tag_cache.hits >= 2
+
+
+def test_rolled_back_tags_are_not_cached():
+    with Session(engine) as session:
+        resolve_tags(session, ["ghost"])
+        session.rollback()
+    assert tag_cache.get_many(["ghost"]) == {}
+
+
+def test_tag_cache_lru_eviction_and_ttl():
+    cache = TagCache(maxsize=2)
+    cache.put_many({"a": 1, "b": 2})
+    cache.get_many(["a"])
+    cache.put_many({"c": 3})
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "c": 3}
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 3, "misses": 1}
+
+    now = [100.0]
+    cache = TagCache(maxsize=10, ttl=5)
+    cache.clock = lambda: now[0]
+    cache.put_many({"a": 1})
+    assert cache.get_many(["a"]) == {"a": 1}
+    now[0] += 6
+    assert cache.get_many(["a"]) == {}
+    cache.put_many({"b": 2})
+    cache.invalidate(["b"])
+    assert cache.get_many(["b"]) == {}
@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from main import app
+from transfer import MAX_IMPORT_ERRORS, iter_records
+
+client = TestClient(app)
+
+
+def collect(chunks, fmt):
+    async def body():
+        for chunk in chunks:
+            yield chunk
+
+    async def run():
+        return [record async for record in iter_records(body(), fmt)]
+
+    return asyncio.run(run())
+
+
+def test_iter_records_handles_split_chunks_and_quoted_newlines():
+    assert collect([b'{"a":', b' 1}\n\n{"b"', b": 2}"], "ndjson") == [(1, '{"a": 1}'), (3, '{"b": 2}')]
+    assert collect([b'name,tags\r\n"multi\nline",x\n'], "csv") == [(1, "name,tags"), (2, '"multi\nline",x')]
+
+
+def test_export_import_roundtrip_ndjson(auth_headers):
+    source = auth_headers("exportuser")
+    client.post(
+        "/media/",
+        json={"name": "Export Me", "category": "book", "status": "completed", "progress": 7, "rating": 9,
+              "tags": [{"name": "Classic"}, {"name": "Long"}]},
+        headers=source,
+    )
+    client.post("/media/", json={"name": "No Tags", "category": "anime", "status": "dropped", "progress": 0}, headers=source)
+
+    response = client.get("/media/export", headers=source)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(l["name"], l["tags"]) for l in lines] == [("Export Me", ["classic", "long"]), ("No Tags", [])]
+
+    target = auth_headers("importuser")
+    body = response.text + "not json\n" + json.dumps({"name": "Bad", "category": "book"}) + "\n"
+    result = client.post("/media/import", content=body, headers=target).json()
+    assert result["imported"] == 2
+    assert result["failed"] == 2
+    assert [e["line"] for e in result["errors"]] == [3, 4]
+
+    imported = {m["name"]: m for m in client.get("/media/", headers=target).json()}
+    assert imported["Export Me"]["rating"] == 9
+    assert imported["Export Me"]["last_edited"] == lines[0]["last_edited"]
+    assert sorted(t["name"] for t in imported["Export Me"]["tags"]) == ["classic", "long"]
+
+
+def test_export_import_roundtrip_csv(auth_headers):
+    source = auth_headers("csvexport")
+    client.post(
+        "/media/",
+        json={"name": 'Comma, "Quote"', "category": "manga", "status": "in progress", "progress": 3,
+              "tags": [{"name": "a"}, {"name": "b"}]},
+        headers=source,
+    )
+    response = client.get("/media/export", params={"format": "csv"}, headers=source)
+    assert response.text.splitlines()[0] == "name,category,status,progress,rating,last_edited,tags"
+
+    target = auth_headers("csvimport")
+    result = client.post("/media/import", params={"format": "csv"}, content=response.text, headers=target).json()
+    assert result == {"imported": 1, "failed": 0, "errors": []}
+    [item] = client.get("/media/", headers=target).json()
+    assert item["name"] == 'Comma, "Quote"'
+    assert sorted(t["name"] for t in item["tags"]) == ["a", "b"]
+
+
+def test_import_reports_malformed_records_per_line(auth_headers):
+    headers = auth_headers("badimport")
+    good = {"name": "Fine", "category": "book", "status": "completed", "progress": 1}
+    lines = [
+        b"5",
+        b"[]",
+        json.dumps({**good, "last_edited": 5}).encode(),
+        json.dumps({**good, "tags": "abc"}).encode(),
+        json.dumps({**good, "tags": [1, 2]}).encode(),
+        b'{"name": "\xff\xfe"}',
+        json.dumps(good).encode(),
+    ]
+    response = client.post("/media/import", content=b"\n".join(lines) + b"\n", headers=headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["imported"], result["failed"]) == (1, 6)
+    errors = {e["line"]: e["error"] for e in result["errors"]}
+    assert errors[1] == errors[2] == "expected a JSON object"
+    assert errors[3].startswith("last_edited")
+    assert errors[4].startswith("tags") and errors[5].startswith("tags")
+    assert "utf-8" in errors[6]
+    assert [m["name"] for m in client.get("/media/", headers=headers).json()] == ["Fine"]
+
+
+def test_import_error_list_is_capped(auth_headers):
+    headers = auth_headers("manyerrors")
+    response = client.post("/media/import", content=b"\xff\n" * 150 + b"[]\n" * 10, headers=headers)
+    result = response.json()
+    assert result["failed"] == 160
+    assert len(result["errors"]) == MAX_IMPORT_ERRORS
@@ -0,0 +1,224 @@
+# transfer.py
+"""Streaming export/import of a user's media library (NDJSON or CSV).
+
+Export reads rows through a server-side cursor and emits one encoded chunk
+per EXPORT_CHUNK_SIZE rows; import consumes the request body line by line
+and hands fixed-size chunks of create operations to apply_media_batch.
+Neither side holds more than a chunk in memory. Both work for the sync and
+the async routes: export_chunks/export_chunks_async differ only in how they
+read, and import_records takes the chunk-applying coroutine from the caller.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, NamedTuple, Sequence, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import BatchItemResult, MediaBase, MediaBatchOp, TagCreate
+from queries import media_export_statement
+
+EXPORT_FIELDS = ["name", "category", "status", "progress", "rating", "last_edited", "tags"]
+CSV_TAG_SEPARATOR = "|"
+MAX_IMPORT_ERRORS = 100
+
+
+def _item(row) -> dict:
+    item = dict(row)
+    item["tags"] = sorted(json.loads(item["tags"]))
+    item["last_edited"] = item["last_edited"].isoformat()
+    return item
+
+
+def _ndjson(rows: Sequence, first: bool) -> str:
+    return "".join(json.dumps(_item(row), ensure_ascii=False) + "\n" for row in rows)
+
+
+def _csv(rows: Sequence, first: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if first:
+        writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        item = _item(row)
+        item["tags"] = CSV_TAG_SEPARATOR.join(item["tags"])
+        writer.writerow([item[field] for field in EXPORT_FIELDS])
+    return buffer.getvalue()
+
+
+class ExportFormat(NamedTuple):
+    media_type: str
+    encode: Callable[[Sequence, bool], str]  # (rows, first chunk) -> text
+
+
+EXPORT_FORMATS = {
+    "ndjson": ExportFormat("application/x-ndjson", _ndjson),
+    "csv": ExportFormat("text/csv", _csv),
+}
+
+
+def _export_statement(dialect_name: str, user_id: int, chunk_size: int):
+    return media_export_statement(user_id, dialect_name).execution_options(yield_per=chunk_size)
+
+
+def export_chunks(session: Session, user_id: int, fmt: str, chunk_size: int = 1000) -> Iterator[str]:
+    encode = EXPORT_FORMATS[fmt].encode
+    result = session.execute(_export_statement(session.get_bind().dialect.name, user_id, chunk_size))
+    first = True
+    for rows in result.mappings().partitions():
+        yield encode(rows, first)
+        first = False
+    if first:
+        yield encode([], True)  # empty library: the CSV header alone
+
+
+async def export_chunks_async(session: AsyncSession, user_id: int, fmt: str, chunk_size: int = 1000) -> AsyncIterator[str]:
+    encode = EXPORT_FORMATS[fmt].encode
+    result = await session.stream(_export_statement(session.bind.dialect.name, user_id, chunk_size))
+    first = True
+    async for rows in result.mappings().partitions():
+        yield encode(rows, first)
+        first = False
+    if first:
+        yield encode([], True)
+
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[int, str]]:
+    """Yield (line number, record text) from a streamed body.
+
+    For CSV a record may span lines when a quoted field contains a newline;
+    a record is complete once its quote count is even. Bytes that are not
+    valid UTF-8 are carried through (surrogateescape) so that the parse_*
+    functions reject just that record, see _utf8().
+    """
+    buffer = b""
+    pending = ""
+    line_no = 0
+    start = 1
+
+    def complete(text: str):
+        return fmt != "csv" or text.count('"') % 2 == 0
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw in lines:
+            line_no += 1
+            text = raw.decode("utf-8", "surrogateescape").rstrip("\r")
+            pending = pending + "\n" + text if pending else text
+            if not pending:
+                start = line_no + 1
+                continue
+            if complete(pending):
+                yield start, pending
+                pending = ""
+                start = line_no + 1
+    if buffer:
+        line_no += 1
+        text = buffer.decode("utf-8", "surrogateescape").rstrip("\r")
+        pending = pending + "\n" + text if pending else text
+    if pending:
+        yield start, pending
+
+
+def _utf8(text: str) -> str:
+    """`text` from iter_records; raises UnicodeDecodeError if its bytes were not UTF-8."""
+    return text.encode("utf-8", "surrogateescape").decode("utf-8")
+
+
+def parse_ndjson(text: str) -> dict:
+    item = json.loads(_utf8(text))
+    if not isinstance(item, dict):
+        raise ValueError("expected a JSON object")
+    return item
+
+
+def parse_csv_header(text: str) -> List[str]:
+    return next(csv.reader([_utf8(text)]))
+
+
+def parse_csv(text: str, header: List[str]) -> dict:
+    values = next(csv.reader([_utf8(text)]))
+    if len(values) != len(header):
+        raise ValueError(f"expected {len(header)} fields, got {len(values)}")
+    item = dict(zip(header, values))
+    item["tags"] = [t for t in item.get("tags", "").split(CSV_TAG_SEPARATOR) if t]
+    return item
+
+
+def to_create_op(item: dict) -> MediaBatchOp:
+    tags = item.get("tags") or []
+    if not isinstance(tags, list) or not all(isinstance(name, str) for name in tags):
+        raise ValueError("tags: expected a list of strings")
+    last_edited = item.get("last_edited")
+    if last_edited is not None and not isinstance(last_edited, str):
+        raise ValueError("last_edited: expected an ISO 8601 string or null")
+    data = MediaBase.model_validate({**item, "tags": [TagCreate(name=name) for name in tags]})
+    # keep the exported timestamp so a restore doesn't reset every last_edited
+    last_edited = datetime.fromisoformat(last_edited) if last_edited else None
+    return MediaBatchOp(op="create", data=data, last_edited=last_edited)
+
+
+def describe_error(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+
+async def import_records(
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    apply_chunk: Callable[[List[MediaBatchOp]], Awaitable[List[BatchItemResult]]],
+    chunk_size: int,
+) -> dict:
+    """Parse a streamed body and create its records, `chunk_size` at a time.
+
+    Records that fail to parse or to apply are counted and reported by line
+    number (at most MAX_IMPORT_ERRORS of them); the rest are imported.
+    """
+    imported = 0
+    failed = 0
+    errors = []
+    header = None
+    chunk, chunk_lines = [], []
+
+    def fail(line_no: int, error: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_IMPORT_ERRORS:
+            errors.append({"line": line_no, "error": error})
+
+    async def flush():
+        nonlocal imported
+        results = await apply_chunk(chunk)
+        for line_no, result in zip(chunk_lines, results):
+            if result.ok:
+                imported += 1
+            else:
+                fail(line_no, result.error)
+        chunk.clear()
+        chunk_lines.clear()
+
+    async for line_no, text in iter_records(chunks, fmt):
+        if fmt == "csv" and header is None:
+            try:
+                header = parse_csv_header(text)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid CSV header: {e}")
+            continue
+        try:
+            item = parse_csv(text, header) if fmt == "csv" else parse_ndjson(text)
+            chunk.append(to_create_op(item))
+            chunk_lines.append(line_no)
+        except (ValueError, TypeError) as e:  # includes UnicodeDecodeError
+            fail(line_no, describe_error(e))
+        if len(chunk) >= chunk_size:
+            await flush()
+    if chunk:
+        await flush()
+
+    return {"imported": imported, "failed": failed, "errors": errors}
@@ -0,0 +1,92 @@
+# versions.py
+"""Per-user version counters behind the ETag / Last-Modified headers of the
+list endpoints and the /sync change cursor.
+
+Every write to a user's media or tasks calls record_changes() inside its
+own transaction, so reading the current validator is a single primary-key
+lookup on `user` and never touches the media/task tables. The UPDATE on the
+user row also serializes a user's writers, which keeps change_seq values
+committed in order.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy import insert, update
+from sqlmodel import Session, select
+
+from events import queue_changes
+from models import Tombstone, User
+from replicas import mark_written
+
+KINDS = ("media", "task")
+
+
+def bump_version(session: Session, user_id: int, kind: str) -> int:
+    """Advance the user's `kind` version and change cursor; return the new change_seq."""
+    version = getattr(User, f"{kind}_version")
+    return session.exec(
+        update(User)
+        .where(User.id == user_id)
+        .values({
+            version: version + 1,
+            getattr(User, f"{kind}_modified"): datetime.utcnow(),
+            User.change_seq: User.change_seq + 1,
+        })
+        .returning(User.change_seq)
+    ).scalar_one()
+
+
+def record_changes(session: Session, user_id: int, kind: str, upserted: Iterable = (), deleted_ids: Iterable[int] = ()) -> int:
+    """Bump the version, stamp changed rows / write tombstones with the new change_seq
+    and queue their /events notifications."""
+    with session.no_autoflush:
+        # stamp before pending rows flush so each INSERT/UPDATE carries its seq
+        seq = bump_version(session, user_id, kind)
+    mark_written(session, user_id)
+    upserted = list(upserted)
+    deleted_ids = list(deleted_ids)
+    queue_changes(session, user_id, kind, seq, upserted, deleted_ids)
+    now = datetime.utcnow()
+    for row in upserted:
+        row.change_seq = seq
+        row.updated_at = now
+    if deleted_ids:
+        session.exec(insert(Tombstone).values([
+            {"user_id": user_id, "entity": kind, "entity_id": entity_id, "change_seq": seq, "deleted_at": now}
+            for entity_id in deleted_ids
+        ]))
+    return seq
+
+
+def version_statement(user_id: int, kind: str):
+    return select(getattr(User, f"{kind}_version"), getattr(User, f"{kind}_modified")).where(User.id == user_id)
+
+
+def current_version(session: Session, user_id: int, kind: str) -> Tuple[int, Optional[datetime]]:
+    row = session.exec(version_statement(user_id, kind)).first()
+    return (row[0], row[1]) if row else (0, None)
+
+
+def validators(user_id: int, kind: str, version: int, modified: Optional[datetime]) -> dict:
+    headers = {"ETag": f'"{kind}-{user_id}-{version}"', "Cache-Control": "private, no-cache"}
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(modified.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, headers: dict) -> bool:
+    """RFC 9110 evaluation order: If-None-Match wins over If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or headers["ETag"] in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and "Last-Modified" in headers:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return parsedate_to_datetime(headers["Last-Modified"]) <= since
+    return False